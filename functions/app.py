@@ -0,0 +1,45 @@
+def create_app():
+    """Create the Flask app and register the blueprints.
+
+    The route modules are imported here rather than at module import time because they apply
+    `firestore.transactional` when loaded, so the benchmarks can install their Firestore client first.
+    """
+    from flask import Flask, jsonify
+    from flask_cors import CORS
+    from routes.changes import changes_bp
+    from routes.categories import categories_bp, categories_cache, categories_responses
+    from routes.reimbursements import reimbursements_bp, reimbursements_responses
+    from routes.semesters import semesters_bp, semesters_responses
+    from routes.transactions import transactions_bp
+    from utils import metrics
+
+    # Create Flask app
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    metrics.init_app(app)
+
+    # Register Blueprints
+    app.register_blueprint(categories_bp, url_prefix="/categories")
+    app.register_blueprint(reimbursements_bp, url_prefix="/reimbursements")
+    app.register_blueprint(transactions_bp, url_prefix="/transactions")
+    app.register_blueprint(semesters_bp, url_prefix="/semesters")
+    app.register_blueprint(changes_bp, url_prefix="/changes")
+
+    @app.get("/")
+    def say_hello():
+        return "Hello, World!"
+
+    @app.get("/_metrics")
+    def get_metrics():
+        """Report this instance's latency histograms and cache hit rates."""
+        return jsonify({
+            "latency": metrics.latency_snapshot(),
+            "caches": {
+                "categories": categories_cache.stats(),
+                "categories_responses": categories_responses.stats(),
+                "reimbursements_responses": reimbursements_responses.stats(),
+                "semesters_responses": semesters_responses.stats()
+            }
+        }), 200
+
+    return app
@@ -0,0 +1,551 @@
+"""In-memory stand-in for the subset of the Firestore client API used by the routes.
+
+Documents are held per collection, `==` filters are served from per-field indexes, and sorted query
+results are reused until their collection is next written to, so paging through a large collection
+does not rescan it. Reads, writes and RPCs are counted the way Firestore bills them: one read per
+document returned (and one for a query that returns nothing), one write per document written, and
+one RPC per call that would reach the server.
+Transactions buffer their writes until commit but are not isolated from concurrent writers.
+"""
+
+import copy
+import threading
+import uuid
+from datetime import datetime, timezone
+from functools import cmp_to_key, wraps
+
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import transforms
+
+# Firestore allows at most 500 writes per commit
+MAX_WRITES_PER_COMMIT = 500
+
+# Sorted query results kept until their collection is written to
+MAX_CACHED_QUERIES = 64
+
+_lock = threading.RLock()
+
+def split_field_path(field_path):
+    """Split a dotted field path, keeping backtick-quoted segments whole."""
+    parts, current, quoted = [], "", False
+    for char in field_path:
+        if char == "`":
+            quoted = not quoted
+        elif char == "." and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+def get_field(data, field_path):
+    """Return the value at `field_path`, raising KeyError if it is missing."""
+    value = data
+    for part in split_field_path(field_path):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+def has_field(data, field_path):
+    try:
+        get_field(data, field_path)
+        return True
+    except KeyError:
+        return False
+
+def sort_key(value):
+    """Order values across types the way Firestore does: null, booleans, numbers, timestamps, strings."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (5, repr(value))
+
+def apply_value(target, key, value):
+    """Store one field value, resolving sentinels and transforms against the current value."""
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = datetime.now(timezone.utc)
+    elif isinstance(value, transforms.Increment):
+        current = target.get(key, 0)
+        target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key, []))
+        target[key] = current + [v for v in value.values if v not in current]
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [v for v in target.get(key, []) if v not in value.values]
+    elif isinstance(value, dict):
+        target[key] = resolve(value)
+    else:
+        target[key] = copy.deepcopy(value)
+
+def resolve(data):
+    """Build a stored document from written data."""
+    resolved = {}
+    for key, value in data.items():
+        apply_value(resolved, key, value)
+    return resolved
+
+def merge(target, data):
+    """Merge written data into a stored document, recursing into maps."""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            merge(target[key], value)
+        else:
+            apply_value(target, key, value)
+
+def update(target, data):
+    """Apply an update keyed by dotted field paths to a stored document."""
+    for field_path, value in data.items():
+        parts = split_field_path(field_path)
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        apply_value(node, parts[-1], value)
+
+def project(data, field_paths):
+    """Keep only the given field paths of a document."""
+    projected = {}
+    for field_path in field_paths:
+        try:
+            value = get_field(data, field_path)
+        except KeyError:
+            continue
+        parts = split_field_path(field_path)
+        node = projected
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = copy.deepcopy(value)
+    return projected
+
+def first_index(rows, predicate):
+    """Return the index of the first row for which `predicate` holds, given it holds for a suffix of `rows`."""
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high) // 2
+        if predicate(rows[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+def split_path(path):
+    """Split a document path into its collection path and document ID."""
+    collection_path, _, document_id = path.rpartition("/")
+    return collection_path, document_id
+
+class OpCounter:
+    """Running totals of the reads, writes and RPCs made against the fake."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    def add(self, reads=0, writes=0, rpcs=0):
+        with _lock:
+            self.reads += reads
+            self.writes += writes
+            self.rpcs += rpcs
+
+    def snapshot(self):
+        return {"reads": self.reads, "writes": self.writes, "rpcs": self.rpcs}
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return copy.deepcopy(get_field(self._data, field_path))
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = split_path(path)[1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, split_path(self.path)[0])
+
+    def collection(self, name):
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None):
+        self._client.ops.add(reads=1, rpcs=1)
+        return self._client._snapshot(self, field_paths)
+
+    def set(self, document_data, merge=False):
+        self._client._commit([("set", self, document_data, merge)])
+
+    def update(self, field_updates):
+        self._client._commit([("update", self, field_updates, False)])
+
+    def delete(self):
+        self._client._commit([("delete", self, None, False)])
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, path, filters=(), orders=(), limit=None, start=None, end=None, fields=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start = start
+        self._end = end
+        self._fields = fields
+
+    def _copy(self, **overrides):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "start": self._start,
+            "end": self._end,
+            "fields": self._fields
+        }
+        state.update(overrides)
+        return Query(self._client, self._path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, True))
+
+    def end_before(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, False))
+
+    def end_at(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, True))
+
+    def _orderings(self):
+        """Return the explicit orderings followed by the implicit document ID ordering."""
+        orders = list(self._orders)
+        if not any(field_path == "__name__" for field_path, _ in orders):
+            orders.append(("__name__", orders[-1][1] if orders else self.ASCENDING))
+        return orders
+
+    @staticmethod
+    def _value(document_id, data, field_path):
+        return document_id if field_path == "__name__" else get_field(data, field_path)
+
+    def _matches(self, document_id, data):
+        for field_path, op, value in self._filters:
+            try:
+                actual = self._value(document_id, data, field_path)
+            except KeyError:
+                return False
+            if isinstance(value, DocumentReference):
+                value = value.id
+            if op in ("<", "<=", ">", ">=") and sort_key(actual)[0] != sort_key(value)[0]:
+                return False
+            if op == "==" and not actual == value:
+                return False
+            if op == "!=" and not (actual != value and actual is not None):
+                return False
+            if op == "<" and not actual < value:
+                return False
+            if op == "<=" and not actual <= value:
+                return False
+            if op == ">" and not actual > value:
+                return False
+            if op == ">=" and not actual >= value:
+                return False
+            if op == "in" and actual not in value:
+                return False
+            if op == "not-in" and (actual in value or actual is None):
+                return False
+            if op == "array_contains" and not (isinstance(actual, list) and value in actual):
+                return False
+            if op == "array_contains_any" and not (isinstance(actual, list) and any(v in actual for v in value)):
+                return False
+        return True
+
+    def _cursor_values(self, cursor, orders):
+        if isinstance(cursor, DocumentSnapshot):
+            return [self._value(cursor.id, cursor._data, field_path) for field_path, _ in orders]
+        if isinstance(cursor, dict):
+            values = []
+            for field_path, _ in orders:
+                if field_path in cursor:
+                    values.append(cursor[field_path])
+                elif field_path != "__name__":
+                    values.append(get_field(cursor, field_path))
+            return [value.id if isinstance(value, DocumentReference) else value for value in values]
+        return list(cursor)
+
+    def _candidates(self, documents):
+        """Return the documents to scan, narrowed by an equality index when the query has an `==` filter."""
+        for field_path, op, value in self._filters:
+            if op == "==" and field_path != "__name__" and isinstance(value, (str, int, float)):
+                document_ids = self._client._equality_index(self._path, field_path).get(value, ())
+                return [(document_id, documents[document_id]) for document_id in document_ids]
+        return documents.items()
+
+    def _run(self):
+        """Return the `(path, data)` pairs the query matches, in order."""
+        orders = self._orderings()
+        descending = [direction == self.DESCENDING for _, direction in orders]
+
+        def row_key(document_id, data):
+            return tuple(sort_key(self._value(document_id, data, field_path)) for field_path, _ in orders)
+
+        def compare(a, b):
+            for key_a, key_b, reverse in zip(a, b, descending):
+                if key_a != key_b:
+                    return (1 if key_a < key_b else -1) if reverse else (-1 if key_a < key_b else 1)
+            return 0
+
+        def sorted_rows():
+            documents = self._client._collections.get(self._path, {})
+            rows = [
+                (row_key(document_id, data), document_id, data) for document_id, data in self._candidates(documents)
+                if self._matches(document_id, data)
+                and all(field_path == "__name__" or has_field(data, field_path) for field_path, _ in orders)
+            ]
+            if all(descending) or not any(descending):
+                rows.sort(key=lambda row: row[0], reverse=descending[0])
+            else:
+                rows.sort(key=cmp_to_key(lambda a, b: compare(a[0], b[0])))
+            return rows
+
+        with _lock:
+            rows = self._client._query_rows(self._path, repr((self._filters, orders)), sorted_rows)
+            start, end = 0, len(rows)
+            if self._start is not None:
+                cursor, inclusive = self._start
+                cursor_key = tuple(sort_key(value) for value in self._cursor_values(cursor, orders))
+                start = first_index(rows, lambda row: compare(row[0][:len(cursor_key)], cursor_key) >= (0 if inclusive else 1))
+            if self._end is not None:
+                cursor, inclusive = self._end
+                cursor_key = tuple(sort_key(value) for value in self._cursor_values(cursor, orders))
+                end = first_index(rows, lambda row: compare(row[0][:len(cursor_key)], cursor_key) >= (1 if inclusive else 0))
+            if self._limit is not None:
+                end = min(end, start + self._limit)
+            return [
+                (f"{self._path}/{document_id}", project(data, self._fields) if self._fields is not None else copy.deepcopy(data))
+                for _, document_id, data in rows[start:end]
+            ]
+
+    def stream(self, transaction=None):
+        rows = self._run()
+        self._client.ops.add(reads=max(len(rows), 1), rpcs=1)
+        for path, data in rows:
+            yield DocumentSnapshot(DocumentReference(self._client, path), data)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = split_path(path)[1]
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        reference.set(document_data)
+        return datetime.now(timezone.utc), reference
+
+    def list_documents(self, page_size=None):
+        """List document IDs, including missing documents that only hold subcollections."""
+        prefix = self._path + "/"
+        with _lock:
+            document_ids = set(self._client._collections.get(self._path, {}))
+            for collection_path in self._client._collections:
+                if collection_path.startswith(prefix):
+                    document_ids.add(collection_path[len(prefix):].split("/", 1)[0])
+        self._client.ops.add(reads=max(len(document_ids), 1), rpcs=1)
+        return [self.document(document_id) for document_id in sorted(document_ids)]
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(("update", reference, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return writes
+
+    def __len__(self):
+        return len(self._writes)
+
+class Transaction(WriteBatch):
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+    def get_all(self, references):
+        return self._client.get_all(references)
+
+def transactional(to_wrap):
+    """Run the function with a transaction and commit its writes once it returns."""
+    @wraps(to_wrap)
+    def wrapper(transaction, *args, **kwargs):
+        result = to_wrap(transaction, *args, **kwargs)
+        transaction.commit()
+        return result
+    return wrapper
+
+class Client:
+    def __init__(self):
+        self._collections = {}
+        self._indexes = {}
+        self._versions = {}
+        self._query_cache = {}
+        self.ops = OpCounter()
+
+    def collection(self, collection_path):
+        return CollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        return DocumentReference(self, document_path)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self.ops.add(reads=len(references), rpcs=1)
+        for reference in references:
+            yield self._snapshot(reference, field_paths)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def _snapshot(self, reference, field_paths=None):
+        collection_path, document_id = split_path(reference.path)
+        with _lock:
+            data = self._collections.get(collection_path, {}).get(document_id)
+            if data is not None:
+                data = project(data, field_paths) if field_paths is not None else copy.deepcopy(data)
+        return DocumentSnapshot(reference, data)
+
+    def _commit(self, writes):
+        """Apply a list of `(op, reference, data, merge)` writes atomically."""
+        if len(writes) > MAX_WRITES_PER_COMMIT:
+            raise ValueError(f"maximum {MAX_WRITES_PER_COMMIT} writes allowed per request")
+        with _lock:
+            exists = {}
+            for op, reference, _, _ in writes:
+                collection_path, document_id = split_path(reference.path)
+                if reference.path not in exists:
+                    exists[reference.path] = document_id in self._collections.get(collection_path, {})
+                if op == "update" and not exists[reference.path]:
+                    raise NotFound(f"No document to update: {reference.path}")
+                exists[reference.path] = op != "delete"
+            for op, reference, data, merge_data in writes:
+                self._apply(op, reference, data, merge_data)
+        self.ops.add(writes=len(writes), rpcs=1)
+
+    def _query_rows(self, collection_path, query_key, build):
+        """Return a query's sorted rows, reusing them until the collection is next written to."""
+        version = self._versions.get(collection_path, 0)
+        cached = self._query_cache.get((collection_path, query_key))
+        if cached is None or cached[0] != version:
+            if len(self._query_cache) >= MAX_CACHED_QUERIES:
+                self._query_cache.pop(next(iter(self._query_cache)))
+            cached = (version, build())
+            self._query_cache[(collection_path, query_key)] = cached
+        return cached[1]
+
+    def _equality_index(self, collection_path, field_path):
+        """Return a `{value: document_ids}` index of one field, building it on first use."""
+        key = (collection_path, field_path)
+        if key not in self._indexes:
+            index = {}
+            for document_id, data in self._collections.get(collection_path, {}).items():
+                self._index_document(index, field_path, document_id, data, add=True)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    @staticmethod
+    def _index_document(index, field_path, document_id, data, add):
+        try:
+            value = get_field(data, field_path)
+        except KeyError:
+            return
+        if not isinstance(value, (str, int, float)):
+            return
+        if add:
+            index.setdefault(value, set()).add(document_id)
+        else:
+            index.get(value, set()).discard(document_id)
+
+    def _apply(self, op, reference, data, merge_data):
+        collection_path, document_id = split_path(reference.path)
+        documents = self._collections.setdefault(collection_path, {})
+        self._versions[collection_path] = self._versions.get(collection_path, 0) + 1
+        indexes = [(field_path, index) for (path, field_path), index in self._indexes.items() if path == collection_path]
+        if document_id in documents:
+            for field_path, index in indexes:
+                self._index_document(index, field_path, document_id, documents[document_id], add=False)
+
+        if op == "delete":
+            documents.pop(document_id, None)
+        elif op == "update":
+            update(documents[document_id], data)
+        elif merge_data:
+            merge(documents.setdefault(document_id, {}), data)
+        else:
+            documents[document_id] = resolve(data)
+
+        if document_id in documents:
+            for field_path, index in indexes:
+                self._index_document(index, field_path, document_id, documents[document_id], add=True)
@@ -0,0 +1,461 @@
+"""Benchmark every API endpoint against an in-memory Firestore fake or the Firestore emulator.
+
+Seeds synthetic categories, semesters, transactions and reimbursements through the API, then drives
+each endpoint through the Flask test client and reports p50/p99 latency, Firestore reads, writes and
+RPCs per request, and peak Python heap per request. Results are written as JSON so runs can be
+compared. Read endpoints run with the response caches cleared before every request, except for the
+scenarios marked as cached.
+
+The default backend is the in-memory fake, which needs no network or credentials. To benchmark
+against the emulator instead, start it (`firebase emulators:start --only firestore`) and pass
+`--backend emulator`; the emulator's data is wiped before seeding.
+
+Run from the `functions` directory:
+
+    python benchmarks/run_benchmarks.py [--transactions 10000] [--iterations 50] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, FUNCTIONS_DIR)
+
+import fake_firestore
+
+# Rows per bulk import request while seeding
+SEED_CHUNK_ROWS = 5000
+
+# Transactions seeded into each semester or category that a scenario deletes
+DELETE_FIXTURE_TRANSACTIONS = 50
+
+# First day of the seeded semesters; each one spans SEMESTER_DAYS
+SEED_START = datetime(2025, 1, 6, tzinfo=timezone.utc)
+SEMESTER_DAYS = 112
+
+PAYER_COUNT = 25
+REQUESTER_COUNT = 25
+
+# Results go to the repository root by default, outside the deployed `functions` source
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(FUNCTIONS_DIR), "benchmark-results.json")
+
+def install_client(backend, project):
+    """Point `firebase_admin.firestore.client()` at the benchmark backend and return its client.
+
+    Must run before the route modules are imported, since they apply `firestore.transactional`
+    at import time.
+    """
+    from firebase_admin import firestore
+
+    if backend == "fake":
+        client = fake_firestore.Client()
+        firestore.transactional = fake_firestore.transactional
+    else:
+        from google.cloud import firestore as cloud_firestore
+        emulator_host = os.environ.get("FIRESTORE_EMULATOR_HOST")
+        if not emulator_host:
+            raise SystemExit("Set FIRESTORE_EMULATOR_HOST to benchmark against the emulator.")
+        reset = urllib.request.Request(
+            f"http://{emulator_host}/emulator/v1/projects/{project}/databases/(default)/documents",
+            method="DELETE"
+        )
+        urllib.request.urlopen(reset).close()
+        client = cloud_firestore.Client(project=project)
+
+    firestore.client = lambda app=None, database_id=None: client
+    return client
+
+def expect(response, *statuses):
+    """Return the response's JSON body, raising if its status is unexpected."""
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.method} {response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:500]}")
+    return response.get_json(silent=True)
+
+def random_time(rng, semester_index):
+    offset = timedelta(seconds=rng.randrange(SEMESTER_DAYS * 24 * 3600))
+    return (SEED_START + timedelta(days=semester_index * SEMESTER_DAYS) + offset).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def transaction_rows(rng, count, semester_index, categories, payers):
+    """Yield `count` synthetic transaction rows for one semester."""
+    for _ in range(count):
+        yield {
+            "payer": rng.choice(payers),
+            "time": random_time(rng, semester_index),
+            "message": rng.choice(("Groceries", "Dues", "Pizza", "Cleaning supplies", "Rent", "Utilities", "Party")),
+            "amount": round(rng.uniform(-250, 250), 2),
+            "category": rng.choice(categories)
+        }
+
+def import_transactions(http, semester_id, rows):
+    """Import rows into a semester through POST /transactions/bulk in NDJSON chunks."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row))
+        if len(chunk) == SEED_CHUNK_ROWS:
+            send_chunk(http, semester_id, chunk)
+            chunk = []
+    if chunk:
+        send_chunk(http, semester_id, chunk)
+
+def send_chunk(http, semester_id, lines):
+    result = expect(http.post(
+        f"/transactions/bulk?semester_id={semester_id}",
+        data="\n".join(lines),
+        content_type="application/x-ndjson"
+    ), 200)
+    if result["error_count"]:
+        raise RuntimeError(f"Seeding failed: {result['errors'][:5]}")
+
+def create_semester(http, name, semester_index):
+    date = (SEED_START + timedelta(days=semester_index * SEMESTER_DAYS)).strftime("%Y-%m-%d")
+    return expect(http.post("/semesters/", json={
+        "name": name,
+        "date": date,
+        "starting_capital": 5000,
+        "active_house_size": 40,
+        "insurance_cost": 25
+    }), 201)["data"]["id"]
+
+def seed(http, rng, args):
+    """Create the benchmark data set through the API and return what the scenarios need from it."""
+    categories = [f"Category {i}" for i in range(args.categories)]
+    for name in categories:
+        expect(http.post("/categories/", json={"name": name}), 201)
+
+    payers = [f"Member {i}" for i in range(PAYER_COUNT)]
+    semester_ids = []
+    for semester_index in range(args.semesters):
+        semester_id = create_semester(http, f"Semester {semester_index}", semester_index)
+        count = args.transactions // args.semesters + (semester_index < args.transactions % args.semesters)
+        import_transactions(http, semester_id, transaction_rows(rng, count, semester_index, categories, payers))
+        semester_ids.append(semester_id)
+
+    requesters = [f"Member {i}" for i in range(REQUESTER_COUNT)]
+    for _ in range(args.reimbursements):
+        expect(http.post("/reimbursements/", json={
+            "date": (SEED_START + timedelta(days=rng.randrange(args.semesters * SEMESTER_DAYS))).strftime("%Y-%m-%d"),
+            "requester": rng.choice(requesters),
+            "amount": round(rng.uniform(5, 300), 2),
+            "reason": "Supplies"
+        }), 201)
+
+    # The largest semester is the first one
+    return {
+        "categories": categories,
+        "payers": payers,
+        "requesters": requesters,
+        "semester_id": semester_ids[0],
+        "semester_ids": semester_ids
+    }
+
+def page_token(http, path, pages):
+    """Follow `next_page_token` from `path` and return the token of page `pages + 1`, if there is one."""
+    token = None
+    for _ in range(pages):
+        separator = "&" if "?" in path else "?"
+        body = expect(http.get(path + (f"{separator}page_token={token}" if token else "")), 200)
+        token = body["next_page_token"]
+        if token is None:
+            break
+    return token
+
+def scenarios(http, rng, data):
+    """Return the benchmark scenarios.
+
+    Each scenario's `prepare(i)` does any untimed setup for iteration `i` and returns the
+    `(method, path, request_kwargs)` of the request to time.
+    """
+    semester_id = data["semester_id"]
+    categories = data["categories"]
+    semester_transactions = f"/transactions/?semester_id={semester_id}"
+    lazy = {}
+
+    def once(key, load):
+        if key not in lazy:
+            lazy[key] = load()
+        return lazy[key]
+
+    def get(path):
+        return lambda i: ("GET", path, {})
+
+    def paged(path, pages):
+        def prepare(i):
+            token = once(path, lambda: page_token(http, path, pages))
+            separator = "&" if "?" in path else "?"
+            return "GET", path + (f"{separator}page_token={token}" if token else ""), {}
+        return prepare
+
+    def transaction_ids():
+        body = expect(http.get(f"{semester_transactions}&limit=500"), 200)
+        return [transaction["id"] for transaction in body["transactions"]]
+
+    def delete_category(i):
+        name = f"Bench delete {i}"
+        expect(http.post("/categories/", json={"name": name}), 201)
+        rows = transaction_rows(rng, DELETE_FIXTURE_TRANSACTIONS, 0, [name], data["payers"])
+        import_transactions(http, semester_id, rows)
+        return "DELETE", f"/categories/{name}", {}
+
+    def delete_reimbursement(i):
+        requester = f"Bench delete {i}"
+        expect(http.post("/reimbursements/", json={"date": "2025-01-06", "requester": requester, "amount": 1, "reason": "Bench"}), 201)
+        body = expect(http.get(f"/reimbursements/?requester={requester}&limit=1"), 200)
+        return "DELETE", f"/reimbursements/{body['reimbursements'][0]['id']}", {}
+
+    def delete_semester(i):
+        scratch_id = create_semester(http, f"Bench delete {i}", 0)
+        import_transactions(http, scratch_id, transaction_rows(rng, DELETE_FIXTURE_TRANSACTIONS, 0, categories, data["payers"]))
+        return "DELETE", f"/semesters/{scratch_id}", {}
+
+    def deletion_status(i):
+        def load():
+            scratch_id = create_semester(http, "Bench deletion status", 0)
+            expect(http.delete(f"/semesters/{scratch_id}"), 200, 202)
+            return scratch_id
+        return "GET", f"/semesters/{once('deleted_semester', load)}/deletion", {}
+
+    def create_transaction(i):
+        row = next(transaction_rows(rng, 1, 0, categories, data["payers"]))
+        return "POST", "/transactions/", {"json": {**row, "semester_id": semester_id}}
+
+    def bulk_import(i):
+        rows = transaction_rows(rng, 100, 0, categories, data["payers"])
+        body = "\n".join(json.dumps(row) for row in rows)
+        return "POST", f"/transactions/bulk?semester_id={semester_id}", {"data": body, "content_type": "application/x-ndjson"}
+
+    def update_transaction(i):
+        ids = once("transaction_ids", transaction_ids)
+        return "PATCH", f"/transactions/{ids[i % len(ids)]}", {"json": {"amount": round(rng.uniform(-250, 250), 2)}}
+
+    def delete_transaction(i):
+        method, path, kwargs = create_transaction(i)
+        transaction_id = expect(http.post(path, **kwargs), 201)["data"]["id"]
+        return "DELETE", f"/transactions/{transaction_id}", {}
+
+    def poll_changes(i):
+        # Catch up first, so the timed poll returns only the transaction created here
+        path = f"/changes/?semester_id={semester_id}"
+        cursor = lazy.get("changes_cursor") or expect(http.get(path), 200)["cursor"]
+        while True:
+            body = expect(http.get(f"{path}&since={cursor}"), 200)
+            cursor = body["cursor"]
+            if not body["changes"]:
+                break
+        lazy["changes_cursor"] = cursor
+        method, create_path, kwargs = create_transaction(i)
+        expect(http.post(create_path, **kwargs), 201)
+        return "GET", f"{path}&since={cursor}", {}
+
+    return [
+        {"name": "GET /categories/", "prepare": get("/categories/")},
+        {"name": "GET /categories/ (cached)", "prepare": get("/categories/"), "warm": True},
+        {"name": "POST /categories/", "prepare": lambda i: ("POST", "/categories/", {"json": {"name": f"Bench category {i}"}})},
+        {"name": "DELETE /categories/<name>", "prepare": delete_category},
+
+        {"name": "GET /reimbursements/", "prepare": get("/reimbursements/")},
+        {"name": "GET /reimbursements/?requester", "prepare": get(f"/reimbursements/?requester={data['requesters'][0]}")},
+        {"name": "GET /reimbursements/ (page 5)", "prepare": paged("/reimbursements/", 4)},
+        {"name": "POST /reimbursements/", "prepare": lambda i: ("POST", "/reimbursements/", {"json": {"date": "2025-02-03", "requester": "Bench", "amount": 12.5, "reason": "Bench"}})},
+        {"name": "DELETE /reimbursements/<id>", "prepare": delete_reimbursement},
+
+        {"name": "GET /semesters/", "prepare": get("/semesters/")},
+        {"name": "GET /semesters/ (cached)", "prepare": get("/semesters/"), "warm": True},
+        {"name": "GET /semesters/?fields=*", "prepare": get("/semesters/?fields=*")},
+        {"name": "GET /semesters/<id>", "prepare": get(f"/semesters/{semester_id}")},
+        {"name": "GET /semesters/<id>/summary", "prepare": get(f"/semesters/{semester_id}/summary")},
+        {"name": "GET /semesters/<id>/export?format=ndjson", "prepare": get(f"/semesters/{semester_id}/export?format=ndjson"), "heavy": True},
+        {"name": "GET /semesters/<id>/export?format=csv", "prepare": get(f"/semesters/{semester_id}/export?format=csv"), "heavy": True},
+        {"name": "POST /semesters/", "prepare": lambda i: ("POST", "/semesters/", {"json": {"name": f"Bench {i}", "date": "2025-01-06", "starting_capital": 100, "active_house_size": 10, "insurance_cost": 5}})},
+        {"name": "PATCH /semesters/<id>", "prepare": lambda i: ("PATCH", f"/semesters/{semester_id}", {"json": {"active_house_size": 40 + i % 5}})},
+        {"name": "POST /semesters/<id>/weekly_balance", "prepare": lambda i: ("POST", f"/semesters/{semester_id}/weekly_balance", {"json": {"date": (SEED_START + timedelta(weeks=i)).strftime("%Y-%m-%d"), "value": 1000 + i}})},
+        {"name": "GET /semesters/<id>/weekly_balance?bucket=month", "prepare": get(f"/semesters/{semester_id}/weekly_balance?bucket=month")},
+        {"name": "DELETE /semesters/<id>", "prepare": delete_semester, "heavy": True},
+        {"name": "GET /semesters/<id>/deletion", "prepare": deletion_status},
+
+        {"name": "GET /transactions/?semester_id", "prepare": get(semester_transactions)},
+        {"name": "GET /transactions/?semester_id&category", "prepare": get(f"{semester_transactions}&category={categories[0]}")},
+        {"name": "GET /transactions/?semester_id&payer&order=amount", "prepare": get(f"{semester_transactions}&payer={data['payers'][0]}&order=amount")},
+        {"name": "GET /transactions/?semester_id&time_from&time_to", "prepare": get(f"{semester_transactions}&time_from=2025-02-01T00:00:00Z&time_to=2025-02-14T23:59:59Z")},
+        {"name": "GET /transactions/?semester_id (page 10)", "prepare": paged(semester_transactions, 9)},
+        {"name": "POST /transactions/", "prepare": create_transaction},
+        {"name": "POST /transactions/bulk (100 rows)", "prepare": bulk_import},
+        {"name": "PATCH /transactions/<id>", "prepare": update_transaction},
+        {"name": "DELETE /transactions/<id>", "prepare": delete_transaction},
+
+        {"name": "GET /changes/?semester_id&since", "prepare": poll_changes}
+    ]
+
+def clear_caches():
+    """Drop every in-process cache so reads go to Firestore."""
+    from routes.categories import categories_cache, categories_responses
+    from routes.reimbursements import reimbursements_responses
+    from routes.semesters import semesters_responses
+
+    categories_cache.clear()
+    for responses in (categories_responses, reimbursements_responses, semesters_responses):
+        responses.invalidate()
+
+def server_timing_ops(response):
+    """Read the Firestore op counts reported in a response's Server-Timing header."""
+    ops = {}
+    for metric in response.headers.get("Server-Timing", "").split(","):
+        name, _, params = metric.strip().partition(";")
+        if name.startswith("firestore-") and params.startswith("desc="):
+            ops[name[len("firestore-"):]] = int(params[len("desc="):].strip('"'))
+    return ops
+
+def send(http, client, method, path, kwargs):
+    """Send one request, draining its body without buffering it, and return `(duration_ms, status, ops)`.
+
+    The fake counts every operation, including those made while a streamed body is produced; with
+    the emulator the counts come from the Server-Timing header, which is set before streaming.
+    """
+    before = client.ops.snapshot() if isinstance(client, fake_firestore.Client) else None
+    started = time.perf_counter()
+    response = http.open(path, method=method, buffered=False, **kwargs)
+    for _ in response.iter_encoded():
+        pass
+    response.close()
+    duration_ms = (time.perf_counter() - started) * 1000
+    if before is not None:
+        after = client.ops.snapshot()
+        ops = {name: after[name] - before[name] for name in after}
+    else:
+        ops = server_timing_ops(response)
+    return duration_ms, response.status_code, ops
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))]
+
+def run_scenario(http, client, scenario, iterations, memory_samples):
+    """Time a scenario after one warm-up request, then measure its peak heap in separate traced runs."""
+    durations, statuses = [], {}
+    totals = {"reads": 0, "writes": 0, "rpcs": 0}
+
+    # One untimed request first, so one-off work such as building a query's result set is not timed
+    method, path, kwargs = scenario["prepare"](iterations + memory_samples)
+    send(http, client, method, path, kwargs)
+
+    for i in range(iterations):
+        if not scenario.get("warm"):
+            clear_caches()
+        method, path, kwargs = scenario["prepare"](i)
+        duration_ms, status, ops = send(http, client, method, path, kwargs)
+        durations.append(duration_ms)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        for name in totals:
+            totals[name] += ops.get(name, 0)
+
+    peaks = []
+    for i in range(iterations, iterations + memory_samples):
+        if not scenario.get("warm"):
+            clear_caches()
+        method, path, kwargs = scenario["prepare"](i)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        send(http, client, method, path, kwargs)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        "name": scenario["name"],
+        "method": method,
+        "iterations": iterations,
+        "status_codes": statuses,
+        "latency_ms": {
+            "p50": round(percentile(durations, 0.50), 3),
+            "p99": round(percentile(durations, 0.99), 3),
+            "mean": round(sum(durations) / len(durations), 3),
+            "min": round(min(durations), 3),
+            "max": round(max(durations), 3)
+        },
+        "firestore_per_request": {name: round(total / iterations, 2) for name, total in totals.items()},
+        "peak_memory_kib": round(max(peaks) / 1024, 1) if peaks else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("fake", "emulator"), default="fake", help="Firestore backend to benchmark against.")
+    parser.add_argument("--project", default="demo-benchmark", help="Project ID used with the emulator.")
+    parser.add_argument("--transactions", type=int, default=1000, help="Transactions to seed, split across the semesters.")
+    parser.add_argument("--semesters", type=int, default=4, help="Semesters to seed.")
+    parser.add_argument("--categories", type=int, default=8, help="Categories to seed.")
+    parser.add_argument("--reimbursements", type=int, default=500, help="Reimbursements to seed.")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed requests per endpoint.")
+    parser.add_argument("--heavy-iterations", type=int, default=5, help="Timed requests per endpoint for exports and semester deletes.")
+    parser.add_argument("--memory-samples", type=int, default=3, help="Extra traced requests per endpoint used to measure peak memory.")
+    parser.add_argument("--only", help="Only run scenarios whose name contains this text.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the synthetic data.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results.")
+    args = parser.parse_args()
+    if args.semesters < 1 or args.categories < 1:
+        parser.error("--semesters and --categories must be at least 1.")
+
+    client = install_client(args.backend, args.project)
+    from app import create_app
+
+    # Keep the per-request log lines out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = run(client, create_app(), args)
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+
+def run(client, app, args):
+    """Seed the data set, run the scenarios and return the report."""
+    http = app.test_client()
+    rng = random.Random(args.seed)
+
+    started_at = datetime.now(timezone.utc)
+    seed_started = time.perf_counter()
+    data = seed(http, rng, args)
+    seed_seconds = time.perf_counter() - seed_started
+    print(f"Seeded {args.transactions} transactions in {seed_seconds:.1f}s", file=sys.stderr)
+
+    results = []
+    for scenario in scenarios(http, rng, data):
+        if args.only and args.only not in scenario["name"]:
+            continue
+        iterations = args.heavy_iterations if scenario.get("heavy") else args.iterations
+        result = run_scenario(http, client, scenario, iterations, args.memory_samples)
+        results.append(result)
+        ops = result["firestore_per_request"]
+        print(
+            f"{result['name']:<55} p50 {result['latency_ms']['p50']:>9.2f} ms  p99 {result['latency_ms']['p99']:>9.2f} ms  "
+            f"reads {ops['reads']:>8}  writes {ops['writes']:>7}  peak {result['peak_memory_kib']} KiB",
+            file=sys.stderr
+        )
+
+    return {
+        "started_at": started_at.isoformat(),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": {
+            "transactions": args.transactions,
+            "semesters": args.semesters,
+            "categories": args.categories,
+            "reimbursements": args.reimbursements
+        },
+        "seed": args.seed,
+        "seed_seconds": round(seed_seconds, 2),
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results
+    }
+
+if __name__ == "__main__":
+    main()
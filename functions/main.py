@@ -1,29 +1,26 @@
+import time
+
+_import_started = time.perf_counter()
+
 from firebase_admin import initialize_app, credentials
 from firebase_functions import https_fn, options
-from flask import Flask, request, redirect
-from flask_cors import CORS
-from routes.categories import categories_bp
-from routes.reimbursements import reimbursements_bp
-from routes.semesters import semesters_bp
-from routes.transactions import transactions_bp
+from app import create_app
+from utils.structured_log import log_event
 
 # Initialize Firebase app with credentials
 cred = credentials.Certificate("serviceAccountKey.json")
 initialize_app(cred)
 
-# Create Flask app
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-# Register Blueprints
-app.register_blueprint(categories_bp, url_prefix="/categories")
-app.register_blueprint(reimbursements_bp, url_prefix="/reimbursements")
-app.register_blueprint(transactions_bp, url_prefix="/transactions")
-app.register_blueprint(semesters_bp, url_prefix="/semesters")
+_import_ms = (time.perf_counter() - _import_started) * 1000
 
-@app.get("/")
-def say_hello():
-    return "Hello, World!"
+# Build the app while the instance starts, rather than within its first request, and report the timings
+_app_started = time.perf_counter()
+app = create_app()
+log_event(
+    "cold_start",
+    module_import_ms=round(_import_ms, 1),
+    app_init_ms=round((time.perf_counter() - _app_started) * 1000, 1)
+)
 
 @https_fn.on_request()
 def api(req: https_fn.Request) -> https_fn.Response:
@@ -32,4 +29,4 @@ def api(req: https_fn.Request) -> https_fn.Response:
 
 # Run the Flask app when the script is executed directly
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True) 
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, debug=True)
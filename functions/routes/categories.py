@@ -1,25 +1,62 @@
 from flask import Blueprint, request, jsonify
 from firebase_admin import firestore
+from routes.semesters import semesters_responses
+from utils.aggregates import get_summary_ref
+from utils.batching import MAX_BATCH_SIZE, chunked, commit_batches, map_parallel
+from utils.cache import TTLCache
+from utils.change_log import change_entry, get_change_ref, record_change
+from utils.db import get_firestore_client
+from utils.http_cache import ResponseCache
 
 # Blueprint for categories routes
 categories_bp = Blueprint("categories", __name__)
 
-def get_firestore_client():
-    """Lazy-load Firestore client to ensure Firebase app is initialized."""
-    return firestore.client()
+# Cached GET responses, cleared by every write in this blueprint
+categories_responses = ResponseCache()
+
+# Transactions reassigned per Firestore transaction, leaving room for one summary write each
+REASSIGN_CHUNK_SIZE = MAX_BATCH_SIZE // 2
+
+# Process-local categories cache shared with the other blueprints, invalidated on every category write
+categories_cache = TTLCache(maxsize=8, ttl=300)
+
+def get_cached_categories():
+    """Return all categories, reading the collection only when the cache is cold or expired."""
+    def load_categories():
+        categories_ref = get_firestore_client().collection("categories")
+        return tuple({"id": doc.id, **doc.to_dict()} for doc in categories_ref.stream())
+    return categories_cache.get_or_load("categories", load_categories)
+
+def get_category_names():
+    """Return the set of existing category names."""
+    return categories_cache.get_or_load("names", lambda: frozenset(category["name"] for category in get_cached_categories()))
+
+def category_exists(category_name):
+    """Check that a category exists.
+
+    Cached names are accepted without a read. A name missing from the cache is looked up with one
+    query, since another instance may have created it after this one cached the names, and the
+    cache is cleared when the lookup finds it.
+    """
+    if category_name in get_category_names():
+        return True
+    categories_ref = get_firestore_client().collection("categories")
+    if not list(categories_ref.where("name", "==", category_name).limit(1).stream()):
+        return False
+    categories_cache.clear()
+    return True
 
 @categories_bp.route("/", methods=["GET"])
+@categories_responses.cached
 def get_categories():
     """Fetch all categories."""
     try:
-        db = get_firestore_client()
-        categories_ref = db.collection("categories")
-        categories = [{"id": doc.id, **doc.to_dict()} for doc in categories_ref.stream()]
-        return jsonify(categories), 200
+        return jsonify(list(get_cached_categories())), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @categories_bp.route("/", methods=["POST"])
+@categories_responses.invalidates
 def create_category():
     """Create a new category."""
     try:
@@ -35,17 +72,63 @@ def create_category():
         if existing_categories:
             return jsonify({"error": f"Category '{data['name']}' already exists."}), 400
 
-        # Add the new category
+        # Add the new category and record it in the change log
         category_data = {"name": data["name"]}
-        categories_ref.add(category_data)
+        batch = db.batch()
+        batch.set(categories_ref.document(), category_data)
+        record_change(batch, db, "category", "created", data["name"], data=category_data)
+        batch.commit()
+        categories_cache.clear()
         return jsonify({"message": "Category created", "data": category_data}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@firestore.transactional
+def reassign_chunk(transaction, db, category_name, transaction_refs):
+    """Reassign a chunk of transactions from a category to 'Uncategorized' atomically.
+
+    The transactions are re-read inside the Firestore transaction, so one whose category or amount
+    was edited since the query is skipped or moved with its current amount, and the semester
+    summaries get the matching category moves. Returns the number of reassigned transactions and
+    the IDs of the affected semesters.
+    """
+    semester_totals, reassigned = {}, 0
+    for txn in transaction.get_all(transaction_refs):
+        txn_data = txn.to_dict() if txn.exists else {}
+        if txn_data.get("category") != category_name:
+            continue
+        transaction.update(txn.reference, {"category": "Uncategorized", "version": firestore.Increment(1)})
+        reassigned += 1
+        semester_id = txn_data.get("semester_id")
+        if semester_id:
+            semester_totals[semester_id] = semester_totals.get(semester_id, 0.0) + float(txn_data["amount"])
+    for _, reference, data in summary_moves(db, category_name, semester_totals):
+        transaction.set(reference, data, merge=True)
+    return reassigned, set(semester_totals)
+
+def summary_moves(db, category_name, semester_totals):
+    """Build the summary writes that move per-semester amounts from a category to 'Uncategorized'."""
+    return [
+        ("merge", get_summary_ref(db, semester_id), {
+            "by_category": {category_name: firestore.Increment(-amount), "Uncategorized": firestore.Increment(amount)}
+        })
+        for semester_id, amount in semester_totals.items()
+    ]
+
 @categories_bp.route("/<string:category_name>", methods=["DELETE"])
+@categories_responses.invalidates
+@semesters_responses.invalidates
 def delete_category_by_name(category_name):
-    """Delete a category by name and update associated transactions to 'Uncategorized'."""
+    """Delete a category by name and update associated transactions to 'Uncategorized'.
+
+    Transactions are reassigned in parallel Firestore transactions before the category itself is
+    deleted, so an interrupted request can simply be retried to finish the job. 'Uncategorized'
+    itself cannot be deleted, since its transactions would have nowhere to go.
+    """
     try:
+        if category_name == "Uncategorized":
+            return jsonify({"error": "The 'Uncategorized' category cannot be deleted."}), 400
+
         db = get_firestore_client()
         categories_ref = db.collection("categories")
         
@@ -55,18 +138,36 @@ def delete_category_by_name(category_name):
         if not matching_categories:
             return jsonify({"error": f"Category with name '{category_name}' not found."}), 404
 
-        # Delete all matching categories
-        for doc in matching_categories:
-            doc.reference.delete()
-
-        # Update all transactions with the deleted category to 'Uncategorized'
-        transactions_ref = db.collection("transactions")
-        transactions_with_category = transactions_ref.where("category", "==", category_name).stream()
+        # Update all transactions with the deleted category to 'Uncategorized', in chunks that
+        # re-read their transactions so concurrent edits are not overwritten
+        transactions_with_category = (
+            db.collection("transactions")
+            .where("category", "==", category_name)
+            .select([])
+            .stream()
+        )
+        chunks = chunked((txn.reference for txn in transactions_with_category), REASSIGN_CHUNK_SIZE)
+        results = map_parallel(lambda refs: reassign_chunk(db.transaction(), db, category_name, refs), chunks)
+        semester_ids = sorted(set().union(*(ids for _, ids in results)))
 
-        for txn in transactions_with_category:
-            txn.reference.update({"category": "Uncategorized"})
+        # Delete all matching categories once nothing refers to them anymore, and drop the
+        # category's leftover entry from the summaries it was moved out of. The change log gets one
+        # entry for the category and one for each semester whose transactions were reassigned.
+        reassigned = {"name": category_name, "reassigned_to": "Uncategorized"}
+        final_writes = [("delete", doc.reference, None) for doc in matching_categories] + [
+            ("set", get_change_ref(db), change_entry("category", "deleted", category_name, semester_id, data=reassigned))
+            for semester_id in [None] + semester_ids
+        ] + [
+            ("merge", get_summary_ref(db, semester_id), {"by_category": {category_name: firestore.DELETE_FIELD}})
+            for semester_id in semester_ids
+        ]
+        commit_batches(db, chunked(final_writes, MAX_BATCH_SIZE))
+        categories_cache.clear()
 
-        return jsonify({"message": f"Category '{category_name}' deleted and associated transactions updated to 'Uncategorized'."}), 200
+        return jsonify({
+            "message": f"Category '{category_name}' deleted and associated transactions updated to 'Uncategorized'.",
+            "reassigned": sum(count for count, _ in results),
+            "batches": len(results)
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
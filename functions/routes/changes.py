@@ -0,0 +1,83 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import json
+import time
+from utils.change_log import encode_cursor, decode_cursor, current_position, is_expired, read_changes
+from utils.db import get_firestore_client
+
+# Blueprint for the change feed
+changes_bp = Blueprint("changes", __name__)
+
+# Most changes returned by one poll or streamed between two reads of the change log
+MAX_CHANGES = 500
+
+# A stream polls the change log this often while idle and ends after its time budget; the client
+# reconnects with its last event ID (EventSource does so on its own)
+STREAM_POLL_SECONDS = 2
+STREAM_TIME_BUDGET_SECONDS = 50
+
+# How long EventSource waits before reconnecting after the stream ends
+STREAM_RETRY_MS = 1000
+
+def read_position():
+    """Read the feed position from `Last-Event-ID` or the `since` parameter.
+
+    Without either, the feed starts now, so a client fetches its cursor before loading the data it
+    keeps in sync. Raises ValueError if the cursor is malformed.
+    """
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if not cursor:
+        return current_position()
+    return decode_cursor(cursor)
+
+def format_event(change):
+    """Format a change as a server-sent event whose ID is the change's cursor."""
+    return f"id: {change['cursor']}\nevent: change\ndata: {json.dumps(change, default=str)}\n\n"
+
+@changes_bp.route("/", methods=["GET"])
+def get_changes():
+    """Fetch the transaction and semester changes made after a cursor.
+
+    Pass the `cursor` of the previous response as `since` and, optionally, a `semester_id` to
+    follow a single semester. Each change names its `entity` ('transaction', 'semester' or
+    'category'), `op` ('created', 'updated', 'deleted' or 'imported'), `id` and `semester_id`, with
+    the document's new `data` and the semester's `current_capital` when they changed.
+
+    A request accepting `text/event-stream` gets the changes as server-sent events, polling the
+    change log for up to `STREAM_TIME_BUDGET_SECONDS`. A cursor older than the change log's
+    retention gets 410; the client then reloads and starts over without `since`.
+    """
+    try:
+        semester_id = request.args.get("semester_id")
+        try:
+            position = read_position()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if is_expired(position):
+            return jsonify({"error": "The cursor is too old; reload the data and start a new feed."}), 410
+
+        db = get_firestore_client()
+        if request.accept_mimetypes.best != "text/event-stream":
+            changes, position = read_changes(db, semester_id, position, MAX_CHANGES)
+            return jsonify({"changes": changes, "cursor": encode_cursor(*position)}), 200
+
+        def generate():
+            stream_position = position
+            deadline = time.monotonic() + STREAM_TIME_BUDGET_SECONDS
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while time.monotonic() < deadline:
+                changes, stream_position = read_changes(db, semester_id, stream_position, MAX_CHANGES)
+                for change in changes:
+                    yield format_event(change)
+                if len(changes) < MAX_CHANGES:
+                    # Move the client's last event ID up to the caught-up position, which also
+                    # keeps idle connections open through proxies
+                    yield f"id: {encode_cursor(*stream_position)}\n\n"
+                    time.sleep(STREAM_POLL_SECONDS)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
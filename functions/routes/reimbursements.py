@@ -1,26 +1,87 @@
 from flask import Blueprint, request, jsonify
 from firebase_admin import firestore
 from datetime import datetime
+from utils.db import get_firestore_client
+from utils.http_cache import ResponseCache
+from utils.pagination import encode_page_token, decode_page_token
 
 # Blueprint for reimbursements routes
 reimbursements_bp = Blueprint("reimbursements", __name__)
 
-def get_firestore_client():
-    """Lazy-load Firestore client to ensure Firebase app is initialized."""
-    return firestore.client()
+# Cached GET responses, cleared by every write in this blueprint
+reimbursements_responses = ResponseCache()
+
+# Pagination limits for GET /reimbursements
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
 
 @reimbursements_bp.route("/", methods=["GET"])
+@reimbursements_responses.cached
 def get_reimbursements():
-    """Fetch all reimbursement requests."""
+    """Fetch a page of reimbursement requests ordered by date.
+
+    Optional query parameters: `requester`, `from` and `to` (inclusive 'YYYY-MM-DD' dates),
+    `order` ('asc' or 'desc', default 'desc'), `limit`, and `page_token` from the previous page.
+    """
     try:
+        requester = request.args.get("requester")
+        date_from = request.args.get("from")
+        date_to = request.args.get("to")
+        order = request.args.get("order", "desc")
+        page_token = request.args.get("page_token")
+
+        if order not in ("asc", "desc"):
+            return jsonify({"error": "'order' must be 'asc' or 'desc'."}), 400
+
+        for name, value in (("from", date_from), ("to", date_to)):
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    return jsonify({"error": f"Invalid '{name}' date format. Use 'YYYY-MM-DD'."}), 400
+
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            return jsonify({"error": "'limit' must be an integer."}), 400
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+
         db = get_firestore_client()
-        reimbursements_ref = db.collection("reimbursements")
-        reimbursements = [{"id": doc.id, **doc.to_dict()} for doc in reimbursements_ref.stream()]
-        return jsonify(reimbursements), 200
+        direction = firestore.Query.ASCENDING if order == "asc" else firestore.Query.DESCENDING
+        query = db.collection("reimbursements")
+        if requester:
+            query = query.where("requester", "==", requester)
+        if date_from:
+            query = query.where("date", ">=", date_from)
+        if date_to:
+            query = query.where("date", "<=", date_to)
+        query = query.order_by("date", direction=direction).order_by("__name__", direction=direction)
+
+        if page_token:
+            try:
+                position = decode_page_token(page_token)
+                if "v" not in position or "id" not in position:
+                    raise ValueError("Invalid page token.")
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            query = query.start_after({"date": position["v"], "__name__": position["id"]})
+
+        reimbursements = [{"id": doc.id, **doc.to_dict()} for doc in query.limit(limit).stream()]
+
+        if len(reimbursements) == limit:
+            next_page_token = encode_page_token({"v": reimbursements[-1]["date"], "id": reimbursements[-1]["id"]})
+        else:
+            next_page_token = None
+
+        return jsonify({
+            "reimbursements": reimbursements,
+            "next_page_token": next_page_token
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @reimbursements_bp.route("/", methods=["POST"])
+@reimbursements_responses.invalidates
 def create_reimbursement():
     """Create a new reimbursement request."""
     try:
@@ -53,6 +114,7 @@ def create_reimbursement():
         return jsonify({"error": str(e)}), 500
 
 @reimbursements_bp.route("/<string:reimbursement_id>", methods=["DELETE"])
+@reimbursements_responses.invalidates
 def delete_reimbursement(reimbursement_id):
     """Delete a reimbursement request by ID."""
     try:
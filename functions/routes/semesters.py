@@ -1,41 +1,204 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, make_response, stream_with_context
 from firebase_admin import firestore
 from datetime import datetime
+from google.api_core.exceptions import NotFound
+import time
+from utils.aggregates import get_summary_ref, empty_summary, rebuild_summary, iso_week_label
+from utils.batching import MAX_BATCH_SIZE, chunked, commit_batches
+from utils.change_log import record_change
+from utils.concurrency import run_parallel
+from utils.db import get_firestore_client
+from utils.http_cache import ResponseCache
+from utils.row_formats import EXPORT_FIELDS, csv_line, ndjson_line
+from utils.validation import finite_number, whole_number
+from utils.versioning import VersionConflict, check_version, expected_version
 
 # Blueprint for semesters routes
 semesters_bp = Blueprint("semesters", __name__)
 
-def get_firestore_client():
-    """Lazy-load Firestore client to ensure Firebase app is initialized."""
-    return firestore.client()
+# Cached GET responses, cleared by every semester write and by transaction writes that move capital
+semesters_responses = ResponseCache()
+
+# Semester deletion works through the transactions in pages and yields after the time budget
+DELETE_PAGE_SIZE = 2000
+DELETE_TIME_BUDGET_SECONDS = 30
+
+# Exports read transactions in pages of this size while streaming them out
+EXPORT_PAGE_SIZE = 1000
+
+# Fields of a semester document; reads are projected onto these so legacy fields are never fetched
+SEMESTER_FIELDS = (
+    "name", "date", "starting_capital", "current_capital", "net_change",
+    "active_house_size", "insurance_cost", "transaction_seq", "version"
+)
+
+# Fields GET /semesters returns when no `fields` parameter is given
+SEMESTER_LIST_FIELDS = ("name", "date")
+
+# Weekly balance downsampling: bucket name to the key of the bucket holding a 'YYYY-MM-DD' date;
+# 'day' returns the stored entries as they are
+BALANCE_BUCKETS = {
+    "day": None,
+    "week": lambda date: iso_week_label(datetime.strptime(date, "%Y-%m-%d")),
+    "month": lambda date: date[:7],
+    "quarter": lambda date: f"{date[:4]}-Q{(int(date[5:7]) - 1) // 3 + 1}"
+}
+
+def parse_fields(default):
+    """Read the `fields` query parameter as a list of semester fields.
+
+    Takes a comma-separated list of names from `SEMESTER_FIELDS`, or '*' for all of them, and falls
+    back to `default`. Returns `(fields, None)` or `(None, error_message)`.
+    """
+    value = request.args.get("fields")
+    if not value:
+        return list(default), None
+    if value == "*":
+        return list(SEMESTER_FIELDS), None
+
+    fields = list(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in SEMESTER_FIELDS]
+    if unknown:
+        return None, f"Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(SEMESTER_FIELDS)} or '*'."
+    return fields, None
 
 @semesters_bp.route("/", methods=["GET"])
+@semesters_responses.cached
 def get_semesters():
-    """Fetch all semesters."""
+    """Fetch all semesters with their ID, name and date.
+
+    The optional `fields` query parameter picks other fields (see `parse_fields`). Only the
+    requested fields are read from Firestore.
+    """
     try:
+        fields, error = parse_fields(SEMESTER_LIST_FIELDS)
+        if error:
+            return jsonify({"error": error}), 400
+
         db = get_firestore_client()
-        semesters_ref = db.collection("semesters")
+        semesters_ref = db.collection("semesters").select(fields)
         semesters = [{"id": doc.id, **doc.to_dict()} for doc in semesters_ref.stream()]
         return jsonify(semesters), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @semesters_bp.route("/<string:semester_id>", methods=["GET"])
+@semesters_responses.cached
 def get_semester(semester_id):
-    """Fetch a specific semester by its ID."""
+    """Fetch a specific semester by its ID.
+
+    Returns every field in `SEMESTER_FIELDS` unless the optional `fields` query parameter narrows them.
+    The ETag carries the semester's version, so it can be sent back as `If-Match` with a PATCH.
+    """
     try:
+        fields, error = parse_fields(SEMESTER_FIELDS)
+        if error:
+            return jsonify({"error": error}), 400
+
         db = get_firestore_client()
-        semester_doc = db.collection("semesters").document(semester_id).get()
+        read_fields = fields if "version" in fields else fields + ["version"]
+        semester_doc = db.collection("semesters").document(semester_id).get(field_paths=read_fields)
 
         if not semester_doc.exists:
             return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
 
         semester_data = {"id": semester_doc.id, **semester_doc.to_dict()}
-        return jsonify(semester_data), 200
+        version = semester_data.get("version", 0)
+        if "version" not in fields:
+            semester_data.pop("version", None)
+        response = make_response(jsonify(semester_data), 200)
+        response.set_etag(str(version))
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@semesters_bp.route("/<string:semester_id>/summary", methods=["GET"])
+@semesters_responses.cached
+def get_semester_summary(semester_id):
+    """Fetch a semester's totals per category, payer and ISO week, with the running capital per week."""
+    try:
+        db = get_firestore_client()
+        semester_ref = db.collection("semesters").document(semester_id)
+        summary_ref = get_summary_ref(db, semester_id)
+
+        # Read the semester and its summary in a single round trip
+        docs = {doc.reference.path: doc for doc in db.get_all([semester_ref, summary_ref])}
+        semester_doc = docs[semester_ref.path]
+        summary_doc = docs[summary_ref.path]
+        if not semester_doc.exists:
+            return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+
+        summary = summary_doc.to_dict() if summary_doc.exists else None
+        if not summary or not summary.get("built"):
+            summary = rebuild_summary(db.transaction(), db, semester_id)
+
+        # Accumulate the running capital week by week
+        capital = float(semester_doc.to_dict().get("starting_capital", 0.0))
+        weekly = []
+        for week, total in sorted(summary.get("by_week", {}).items()):
+            capital += total
+            weekly.append({"week": week, "total": total, "capital": capital})
+
+        return jsonify({
+            "semester_id": semester_id,
+            "transaction_count": summary.get("count", 0),
+            "total": summary.get("total", 0.0),
+            "by_category": summary.get("by_category", {}),
+            "by_payer": summary.get("by_payer", {}),
+            "weekly": weekly
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@semesters_bp.route("/<string:semester_id>/export", methods=["GET"])
+def export_semester(semester_id):
+    """Stream a semester's transactions in the order they were added, as NDJSON (default) or CSV.
+
+    Rows are written out as they are read, one page of `EXPORT_PAGE_SIZE` at a time, so memory use
+    does not depend on the size of the semester.
+    """
+    try:
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in ("ndjson", "csv"):
+            return jsonify({"error": "'format' must be 'ndjson' or 'csv'."}), 400
+
+        db = get_firestore_client()
+        if not db.collection("semesters").document(semester_id).get().exists:
+            return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+
+        query = (
+            db.collection("transactions")
+            .where("semester_id", "==", semester_id)
+            .order_by("seq")
+            .limit(EXPORT_PAGE_SIZE)
+        )
+        format_row = csv_line if export_format == "csv" else ndjson_line
+
+        def generate():
+            if export_format == "csv":
+                yield csv_line(dict(zip(EXPORT_FIELDS, EXPORT_FIELDS)))
+            page_query = query
+            while True:
+                count, last_seq = 0, None
+                for doc in page_query.stream():
+                    row = {"id": doc.id, **doc.to_dict()}
+                    count, last_seq = count + 1, row["seq"]
+                    yield format_row(row)
+                if count < EXPORT_PAGE_SIZE:
+                    break
+                page_query = query.start_after({"seq": last_seq})
+
+        mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=semester-{semester_id}.{export_format}"}
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @semesters_bp.route("/", methods=["POST"])
+@semesters_responses.invalidates
 def create_semester():
     """Create a new semester."""
     try:
@@ -55,68 +218,271 @@ def create_semester():
             "net_change": 0.0,
             "active_house_size": int(data["active_house_size"]),
             "insurance_cost": float(data["insurance_cost"]),
-            "weekly_balance": [],
-            "transactions": []
+            "transaction_seq": 0,
+            "version": 1
         }
-        semester_ref = semesters_ref.add(semester_data)
-        
-        # Extract the document ID
-        semester_id = semester_ref[1].id
+        semester_ref = semesters_ref.document()
+        semester_id = semester_ref.id
+
+        # Create the semester together with its empty summary and its change log entry
+        batch = db.batch()
+        batch.set(semester_ref, semester_data)
+        batch.set(get_summary_ref(db, semester_id), empty_summary())
+        record_change(batch, db, "semester", "created", semester_id, semester_id, data=semester_data)
+        batch.commit()
 
         # Include the ID in the response
         return jsonify({"message": "Semester created", "data": {"id": semester_id, **semester_data}}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def parse_name(value):
+    """Return a non-empty string, raising ValueError otherwise."""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("Expected a non-empty string.")
+    return value
+
+def parse_date(value):
+    """Return a 'YYYY-MM-DD' date string, raising ValueError otherwise."""
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+# Fields PATCH /semesters/<id> accepts, with the function that validates and converts each value
+SEMESTER_UPDATE_FIELDS = {
+    "name": parse_name,
+    "date": parse_date,
+    "starting_capital": finite_number,
+    "active_house_size": whole_number,
+    "insurance_cost": finite_number
+}
+
+def parse_semester_update(data):
+    """Validate a PATCH payload against `SEMESTER_UPDATE_FIELDS`.
+
+    Returns `(fields, None)` with the converted values, or `(None, error_message)`.
+    """
+    if not isinstance(data, dict) or not data:
+        return None, f"Expected an object with any of: {', '.join(SEMESTER_UPDATE_FIELDS)}."
+    unknown = [field for field in data if field not in SEMESTER_UPDATE_FIELDS]
+    if unknown:
+        return None, f"Field(s) cannot be updated: {', '.join(unknown)}. Allowed: {', '.join(SEMESTER_UPDATE_FIELDS)}."
+
+    fields = {}
+    for field, value in data.items():
+        try:
+            fields[field] = SEMESTER_UPDATE_FIELDS[field](value)
+        except (TypeError, ValueError):
+            return None, f"Invalid value for '{field}'."
+    return fields, None
+
+@firestore.transactional
+def apply_semester_update(transaction, db, semester_ref, fields, version):
+    """Update a semester's fields if it still has the expected version, and return the stored result.
+
+    A change to `starting_capital` shifts `current_capital` by the same amount, so capital that
+    transactions added concurrently is kept. The result is recorded in the change log. Raises
+    NotFound or VersionConflict.
+    """
+    semester_doc = semester_ref.get(transaction=transaction)
+    if not semester_doc.exists or semester_doc.to_dict().get("deleting"):
+        raise NotFound(f"Semester with ID '{semester_ref.id}' not found.")
+
+    semester_data = semester_doc.to_dict()
+    current_version = check_version(semester_data, version)
+    update = {**fields, "version": current_version + 1}
+    if "starting_capital" in fields:
+        capital_change = fields["starting_capital"] - float(semester_data.get("starting_capital", 0.0))
+        update["current_capital"] = firestore.Increment(capital_change)
+        semester_data["current_capital"] = float(semester_data.get("current_capital", 0.0)) + capital_change
+
+    transaction.update(semester_ref, update)
+    semester_data = {**semester_data, **fields, "version": current_version + 1}
+    data = {field: semester_data[field] for field in SEMESTER_FIELDS if field in semester_data}
+    record_change(transaction, db, "semester", "updated", semester_ref.id, semester_ref.id, data=data)
+    return semester_data
+
 @semesters_bp.route("/<string:semester_id>", methods=["PATCH"])
+@semesters_responses.invalidates
 def update_semester(semester_id):
-    """Update semester fields."""
+    """Update a semester's name, date, starting capital, house size or insurance cost.
+
+    `current_capital` is derived from the starting capital and the transactions, so it cannot be
+    set directly. Send the semester's `version` in `If-Match` to have the update rejected with 409
+    if the semester changed since it was read.
+    """
     try:
-        data = request.get_json()
-        db = get_firestore_client()
-        semester_doc = db.collection("semesters").document(semester_id)
+        fields, error = parse_semester_update(request.get_json(silent=True))
+        if error:
+            return jsonify({"error": error}), 400
+        try:
+            version = expected_version()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        if not semester_doc.get().exists:
+        db = get_firestore_client()
+        semester_ref = db.collection("semesters").document(semester_id)
+        try:
+            semester_data = apply_semester_update(db.transaction(), db, semester_ref, fields, version)
+        except NotFound:
             return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "version": e.current_version}), 409
 
-        semester_doc.update(data)
-        return jsonify({"message": "Semester updated."}), 200
+        data = {field: semester_data[field] for field in SEMESTER_FIELDS if field in semester_data}
+        return jsonify({"message": "Semester updated.", "data": {"id": semester_id, **data}}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def get_deletion_ref(db, semester_id):
+    """Return the reference of the document tracking a semester's deletion progress."""
+    return db.collection("semester_deletions").document(semester_id)
+
 @semesters_bp.route("/<string:semester_id>", methods=["DELETE"])
+@semesters_responses.invalidates
 def delete_semester(semester_id):
-    """Delete a semester and all its associated transactions."""
+    """Delete a semester with its associated transactions and weekly balances.
+
+    Transactions are deleted in batches for up to `DELETE_TIME_BUDGET_SECONDS`. If the semester is
+    too large to finish in that time, the request returns 202 and the progress is kept in
+    `semester_deletions/<semester_id>`; repeating the request resumes where it left off, and
+    `GET /semesters/<semester_id>/deletion` reports the progress.
+    """
     try:
         db = get_firestore_client()
-
-        # Fetch the semester document
         semester_ref = db.collection("semesters").document(semester_id)
-        semester_doc = semester_ref.get()
+        deletion_ref = get_deletion_ref(db, semester_id)
+
+        # Check the semester exists, or report a deletion that already finished
+        docs = {doc.reference.path: doc for doc in db.get_all([semester_ref, deletion_ref])}
+        semester_doc = docs[semester_ref.path]
+        deletion_doc = docs[deletion_ref.path]
         if not semester_doc.exists:
+            if deletion_doc.exists:
+                return jsonify({"message": f"Semester with ID '{semester_id}' already deleted.", **deletion_doc.to_dict()}), 200
             return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
 
-        # Fetch transaction IDs associated with the semester
-        semester_data = semester_doc.to_dict()
-        transaction_ids = semester_data.get("transactions", [])
+        # Record the job first so progress survives a restart, and stop new transactions joining the semester
+        batch = db.batch()
+        batch.set(deletion_ref, {"status": "running", "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        batch.update(semester_ref, {"deleting": True})
+        batch.commit()
 
-        # Delete all associated transactions
-        for transaction_id in transaction_ids:
-            transaction_doc = db.collection("transactions").document(transaction_id)
-            if transaction_doc.get().exists:
-                transaction_doc.delete()
+        # Delete associated transactions page by page, without reading them first
+        deadline = time.monotonic() + DELETE_TIME_BUDGET_SECONDS
+        transactions_query = (
+            db.collection("transactions")
+            .where("semester_id", "==", semester_id)
+            .select([])
+            .limit(DELETE_PAGE_SIZE)
+        )
+        while True:
+            refs = [doc.reference for doc in transactions_query.stream()]
+            if refs:
+                deleted = commit_batches(db, chunked([("delete", ref, None) for ref in refs], MAX_BATCH_SIZE))["writes"]
+                deletion_ref.update({"deleted": firestore.Increment(deleted), "updated_at": firestore.SERVER_TIMESTAMP})
+            if len(refs) < DELETE_PAGE_SIZE:
+                break
+            if time.monotonic() >= deadline:
+                return jsonify({
+                    "message": f"Deletion of semester '{semester_id}' is in progress; repeat the request to continue.",
+                    "status_url": f"/semesters/{semester_id}/deletion"
+                }), 202
 
-        # Delete the semester document
-        semester_ref.delete()
+        # Delete the weekly balance entries, then the semester document and its summary, record the
+        # deletion in the change log and mark the job done
+        balance_refs = [doc.reference for doc in get_weekly_balance_ref(db, semester_id).select([]).stream()]
+        commit_batches(db, chunked([("delete", ref, None) for ref in balance_refs], MAX_BATCH_SIZE))
+        batch = db.batch()
+        batch.delete(get_summary_ref(db, semester_id))
+        batch.delete(semester_ref)
+        record_change(batch, db, "semester", "deleted", semester_id, semester_id)
+        batch.set(deletion_ref, {"status": "done", "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        batch.commit()
 
         return jsonify({"message": f"Semester with ID '{semester_id}' and its associated transactions deleted."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@semesters_bp.route("/<string:semester_id>/deletion", methods=["GET"])
+def get_semester_deletion(semester_id):
+    """Fetch the progress of a semester's deletion."""
+    try:
+        db = get_firestore_client()
+        deletion_doc = get_deletion_ref(db, semester_id).get()
+
+        if not deletion_doc.exists:
+            return jsonify({"error": f"No deletion found for semester with ID '{semester_id}'."}), 404
+
+        return jsonify({"semester_id": semester_id, "deleted": 0, **deletion_doc.to_dict()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def get_weekly_balance_ref(db, semester_id):
+    """Return the collection of a semester's weekly balance entries, keyed by 'YYYY-MM-DD' date."""
+    return db.collection("semesters").document(semester_id).collection("weekly_balance")
+
+@semesters_bp.route("/<string:semester_id>/weekly_balance", methods=["GET"])
+@semesters_responses.cached
+def get_weekly_balance(semester_id):
+    """Fetch a semester's weekly balance entries in date order.
+
+    Optional query parameters: `from` and `to` (inclusive 'YYYY-MM-DD' dates) and `bucket`
+    ('week', the default, 'month', 'quarter', or 'day' for the stored entries). Each bucket
+    reports its closing balance together with the lowest and highest balance and the number of
+    entries in it; weeks are ISO weeks, labelled like '2025-W03'.
+    """
+    try:
+        date_from = request.args.get("from")
+        date_to = request.args.get("to")
+        bucket = request.args.get("bucket", "week")
+
+        if bucket not in BALANCE_BUCKETS:
+            return jsonify({"error": f"'bucket' must be one of {', '.join(BALANCE_BUCKETS)}."}), 400
+
+        for name, value in (("from", date_from), ("to", date_to)):
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    return jsonify({"error": f"Invalid '{name}' date format. Use 'YYYY-MM-DD'."}), 400
+
+        db = get_firestore_client()
+        query = get_weekly_balance_ref(db, semester_id)
+        if date_from:
+            query = query.where("date", ">=", date_from)
+        if date_to:
+            query = query.where("date", "<=", date_to)
+        query = query.order_by("date")
+
+        # Read the semester and the balance range concurrently
+        semester_doc, balance_docs = run_parallel(
+            db.collection("semesters").document(semester_id).get,
+            lambda: list(query.stream())
+        )
+        if not semester_doc.exists:
+            return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+
+        entries = [doc.to_dict() for doc in balance_docs]
+        if bucket != "day":
+            buckets = {}
+            for entry in entries:
+                key = BALANCE_BUCKETS[bucket](entry["date"])
+                if key not in buckets:
+                    buckets[key] = {"bucket": key, "min": entry["value"], "max": entry["value"], "count": 0}
+                current = buckets[key]
+                current.update(date=entry["date"], value=entry["value"], count=current["count"] + 1)
+                current["min"] = min(current["min"], entry["value"])
+                current["max"] = max(current["max"], entry["value"])
+            entries = list(buckets.values())
+
+        return jsonify({"semester_id": semester_id, "bucket": bucket, "weekly_balance": entries}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @semesters_bp.route("/<string:semester_id>/weekly_balance", methods=["POST"])
+@semesters_responses.invalidates
 def add_weekly_balance(semester_id):
-    """Add a weekly balance entry with value and date."""
+    """Record a semester's balance for a date, replacing any entry already recorded for that date."""
     try:
         data = request.get_json()
         required_fields = ["date", "value"]
@@ -131,20 +497,16 @@ def add_weekly_balance(semester_id):
             return jsonify({"error": "Invalid date format. Use 'YYYY-MM-DD'."}), 400
 
         db = get_firestore_client()
-        semester_doc = db.collection("semesters").document(semester_id)
-
-        if not semester_doc.get().exists:
+        semester_snapshot = db.collection("semesters").document(semester_id).get()
+        if not semester_snapshot.exists or semester_snapshot.to_dict().get("deleting"):
             return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
 
-        # Add the weekly balance entry
-        semester_data = semester_doc.get().to_dict()
+        # Each entry is its own document, so an append writes only that entry
         new_weekly_balance = {
             "date": balance_date,
             "value": float(data["value"])
         }
-        updated_weekly_balance = semester_data.get("weekly_balance", []) + [new_weekly_balance]
-
-        semester_doc.update({"weekly_balance": updated_weekly_balance})
+        get_weekly_balance_ref(db, semester_id).document(balance_date).set(new_weekly_balance)
         return jsonify({"message": "Weekly balance entry added.", "data": new_weekly_balance}), 201
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -1,185 +1,650 @@
 from flask import Blueprint, request, jsonify
 from firebase_admin import firestore
 from datetime import datetime
+import hashlib
+from google.api_core.exceptions import NotFound
+from routes.categories import category_exists, get_category_names
+from routes.semesters import semesters_responses
+from utils.aggregates import get_summary_ref, summary_update
+from utils.batching import MAX_BATCH_SIZE
+from utils.change_log import record_change
+from utils.concurrency import run_parallel
+from utils.db import get_firestore_client
+from utils.pagination import encode_page_token, decode_page_token
+from utils.row_formats import read_rows
+from utils.validation import finite_number
+from utils.versioning import VersionConflict, check_version, expected_version
 
 # Blueprint for transactions routes
 transactions_bp = Blueprint("transactions", __name__)
 
-def get_firestore_client():
-    """Lazy-load Firestore client to ensure Firebase app is initialized."""
-    return firestore.client()
+# Pagination limits for GET /transactions
+DEFAULT_PAGE_LIMIT = 10
+MAX_PAGE_LIMIT = 500
 
-def validate_category(category_name):
-    """Validate that the category exists in the database."""
-    db = get_firestore_client()
-    categories_ref = db.collection("categories")
-    return any(doc.to_dict()["name"] == category_name for doc in categories_ref.stream())
+# Most rows a filtered page scans before returning what it found so far, and the fewest it reads per
+# query, so a sparse filter takes at most MAX_SCAN_ROWS / MIN_SCAN_BATCH round trips
+MAX_SCAN_ROWS = 2000
+MIN_SCAN_BATCH = 200
+
+# Sortable fields of GET /transactions, keyed by the value of its `order` parameter
+ORDER_FIELDS = {"added": "seq", "time": "time", "amount": "amount", "message": "message"}
+
+# Range-filtered fields that can run in the query next to the sort, in order of preference; each
+# pairing has a (semester_id, equality filters, sorted field, range field) index for every
+# combination of the `category` and `payer` filters
+INDEXED_RANGE_FIELDS = ("time", "amount", "message")
+
+# Fields PATCH /transactions/<id> accepts; moving a transaction to another semester is not supported
+TRANSACTION_UPDATE_FIELDS = ("payer", "time", "message", "amount", "category")
+
+# Fields that feed the semester summaries
+SUMMARIZED_FIELDS = ("amount", "category", "payer", "time")
+
+# Bulk imports write at most this many transactions per Firestore transaction
+IMPORT_CHUNK_SIZE = 400
+MAX_REPORTED_ERRORS = 100
+
+def parse_transaction(data, is_category):
+    """Validate a transaction payload, checking its category with the `is_category` predicate.
+
+    Returns `(transaction_data, None)` with the fields to store, or `(None, error_message)`.
+    """
+    required_fields = ["payer", "time", "message", "amount", "category", "semester_id"]
+    for field in required_fields:
+        if field not in data:
+            return None, f"'{field}' is required."
+
+    # Validate the semester ID, which becomes part of a document path
+    semester_id = data["semester_id"]
+    if not isinstance(semester_id, str) or not semester_id or "/" in semester_id:
+        return None, "'semester_id' must be a non-empty semester ID."
+
+    # Validate category
+    if not isinstance(data["category"], str) or not is_category(data["category"]):
+        return None, f"Category '{data['category']}' does not exist."
+
+    # Parse and validate time
+    try:
+        datetime.strptime(data["time"], "%Y-%m-%dT%H:%M:%SZ")
+    except (TypeError, ValueError):
+        return None, "Invalid time format. Use ISO 8601 (e.g., '2025-01-15T12:34:56Z')."
+
+    try:
+        amount = finite_number(data["amount"])
+    except (TypeError, ValueError):
+        return None, "'amount' must be a finite number."
+
+    return {
+        "payer": data["payer"],
+        "time": data["time"],
+        "message": data["message"],
+        "amount": amount,
+        "category": data["category"],
+        "semester_id": data["semester_id"]
+    }, None
+
+@firestore.transactional
+def add_transaction_to_semester(transaction, db, semester_ref, summary_ref, transaction_ref, transaction_data):
+    """Assign the transaction the semester's next sequence number and adjust its capital and summary.
+
+    The new transaction and the semester's capital are recorded in the change log.
+
+    Returns the assigned sequence number, or None if the semester does not exist or is being deleted.
+    """
+    semester_doc = semester_ref.get(transaction=transaction)
+    if not semester_doc.exists:
+        return None
+
+    semester_data = semester_doc.to_dict()
+    if semester_data.get("deleting"):
+        return None
+
+    seq = semester_data.get("transaction_seq", 0) + 1
+    stored_data = {**transaction_data, "seq": seq, "version": 1}
+    transaction.set(transaction_ref, stored_data)
+    transaction.update(semester_ref, {
+        "transaction_seq": seq,
+        "current_capital": firestore.Increment(transaction_data["amount"])
+    })
+    transaction.set(summary_ref, summary_update(added=[transaction_data]), merge=True)
+    record_change(
+        transaction, db, "transaction", "created", transaction_ref.id, semester_ref.id, data=stored_data,
+        current_capital=float(semester_data.get("current_capital", 0.0)) + transaction_data["amount"]
+    )
+    return seq
+
+def parse_filters(args):
+    """Read the equality and range filters of GET /transactions from the query parameters.
+
+    Returns `(equalities, ranges, None)`, where `ranges` maps a field to inclusive `(low, high)`
+    bounds (either may be None), or `(None, None, error_message)`.
+    """
+    equalities = {field: args[field] for field in ("category", "payer") if args.get(field)}
+    ranges = {}
+
+    time_from, time_to = args.get("time_from"), args.get("time_to")
+    for value in (time_from, time_to):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+            except ValueError:
+                return None, None, "Invalid time format. Use ISO 8601 (e.g., '2025-01-15T12:34:56Z')."
+    if time_from or time_to:
+        ranges["time"] = (time_from or None, time_to or None)
+
+    try:
+        amount_min = float(args["amount_min"]) if args.get("amount_min") else None
+        amount_max = float(args["amount_max"]) if args.get("amount_max") else None
+    except ValueError:
+        return None, None, "'amount_min' and 'amount_max' must be numbers."
+    if amount_min is not None or amount_max is not None:
+        ranges["amount"] = (amount_min, amount_max)
+
+    message_prefix = args.get("message_prefix")
+    if message_prefix:
+        ranges["message"] = (message_prefix, message_prefix + "\uf8ff")
+
+    return equalities, ranges, None
+
+def in_ranges(transaction, ranges):
+    """Check a transaction against inclusive range filters that the query could not apply."""
+    for field, (low, high) in ranges.items():
+        value = transaction.get(field)
+        if value is None or (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+def get_page(query, field, limit, page_token, fetch_all, post_ranges, bounds=(None, None)):
+    """Page through an ordered transactions query, applying any range filters left to `post_ranges`.
+
+    `bounds` holds the first and last value of the sorted field in query order, both inclusive
+    and either optional; they are applied as cursors, so they need no inequality index. Rows are
+    read in batches of the page size, or of at least `MIN_SCAN_BATCH` while `post_ranges` filters
+    them, and streamed only until the page is full. The page token points after the last row
+    scanned, so a later page does not read those rows again. Filtered pages stop scanning after
+    `MAX_SCAN_ROWS` rows and may then come back short, with a `next_page_token` to continue from
+    where the scan stopped.
+    """
+    def cursor(transaction):
+        return {field: transaction[field], "__name__": transaction["id"]}
+
+    first, final = bounds
+    if page_token:
+        position = decode_page_token(page_token)
+        if "v" not in position or "id" not in position:
+            raise ValueError("Invalid page token.")
+        query = query.start_after({field: position["v"], "__name__": position["id"]})
+    elif first is not None:
+        query = query.start_at({field: first})
+    if final is not None:
+        query = query.end_at({field: final})
+
+    if fetch_all:
+        batch_size = MAX_PAGE_LIMIT
+    else:
+        batch_size = max(limit, MIN_SCAN_BATCH) if post_ranges else limit
+    transactions, scanned, last, exhausted = [], 0, None, False
+    while True:
+        batch_count = 0
+        for doc in query.limit(batch_size).stream():
+            last = {"id": doc.id, **doc.to_dict()}
+            batch_count += 1
+            scanned += 1
+            if in_ranges(last, post_ranges):
+                transactions.append(last)
+                if not fetch_all and len(transactions) == limit:
+                    break
+
+        page_full = not fetch_all and len(transactions) == limit
+        if page_full:
+            break
+        if batch_count < batch_size:
+            exhausted = True
+            break
+        if not fetch_all and scanned >= MAX_SCAN_ROWS:
+            break
+        query = query.start_after(cursor(last))
+
+    if exhausted or last is None:
+        next_start_after = next_page_token = None
+    else:
+        next_start_after = last["id"]
+        next_page_token = encode_page_token({"v": last[field], "id": next_start_after})
+
+    return {
+        "transactions": transactions,
+        "next_start_after": next_start_after,
+        "next_page_token": next_page_token
+    }
 
 @transactions_bp.route("/", methods=["GET"])
 def get_transactions():
-    """Fetch paginated transactions for a specific semester, in the order they were added."""
+    """Fetch paginated, optionally filtered transactions for a specific semester.
+
+    By default transactions come back in the order they were added; pass `order` (`added`, `time`,
+    `amount` or `message`) and `direction` (`asc` or `desc`) to sort them otherwise. Results can be
+    filtered by `category`, `payer`, `time_from`/`time_to`, `amount_min`/`amount_max` and
+    `message_prefix`. Equality filters, the range on the sorted field and one other range run in
+    the Firestore query; any remaining ranges are applied while scanning. Follow `next_page_token` with `page_token` to get the
+    next page, or pass `all=true` to fetch the rest of the results in batches of `MAX_PAGE_LIMIT`.
+    """
     try:
         # Extract query parameters
         semester_id = request.args.get("semester_id")
-        limit = int(request.args.get("limit", 10))  # Default to 10 transactions
+        page_token = request.args.get("page_token")  # Optional: Token returned with the previous page
         start_after = request.args.get("start_after")  # Optional: Last transaction ID from the previous page
+        order = request.args.get("order", "added")
+        direction = request.args.get("direction", "asc")
+        fetch_all = request.args.get("all", "false").lower() == "true"
 
         if not semester_id:
             return jsonify({"error": "'semester_id' is required as a query parameter."}), 400
 
-        db = get_firestore_client()
-
-        # Fetch the semester document
-        semester_doc = db.collection("semesters").document(semester_id).get()
-        if not semester_doc.exists:
-            return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+        if order not in ORDER_FIELDS:
+            return jsonify({"error": f"'order' must be one of {', '.join(ORDER_FIELDS)}."}), 400
+        field = ORDER_FIELDS[order]
 
-        # Get the list of transaction IDs in the order they were added
-        semester_data = semester_doc.to_dict()
-        transaction_ids = semester_data.get("transactions", [])
+        if direction not in ("asc", "desc"):
+            return jsonify({"error": "'direction' must be 'asc' or 'desc'."}), 400
 
-        if not transaction_ids:
-            return jsonify([]), 200
+        equalities, ranges, error = parse_filters(request.args)
+        if error:
+            return jsonify({"error": error}), 400
 
-        # Apply pagination
-        if start_after:
-            if start_after not in transaction_ids:
-                return jsonify({"error": f"'start_after' ID '{start_after}' not valid for this semester."}), 400
-
-            # Start after the specified transaction ID
-            start_index = transaction_ids.index(start_after) + 1
-        else:
-            start_index = 0
-
-        # Paginate transaction IDs
-        paginated_ids = transaction_ids[start_index:start_index + limit]
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            return jsonify({"error": "'limit' must be an integer."}), 400
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
 
-        # Fetch transactions using their IDs
-        transactions = []
-        for transaction_id in paginated_ids:
-            transaction_doc = db.collection("transactions").document(transaction_id).get()
-            if transaction_doc.exists:
-                transactions.append({"id": transaction_id, **transaction_doc.to_dict()})
+        db = get_firestore_client()
 
-        # Determine the next page's starting ID
-        next_start_after = paginated_ids[-1] if len(paginated_ids) == limit else None
+        # Equality filters are answered by merging the single-filter indexes, and the range on the
+        # sorted field becomes cursors, which need no inequality index
+        query = db.collection("transactions").where("semester_id", "==", semester_id)
+        for name, value in equalities.items():
+            query = query.where(name, "==", value)
+        low, high = ranges.pop(field, (None, None))
+        bounds = (low, high) if direction == "asc" else (high, low)
+
+        # One more range runs in the query, backed by a composite index with the equality filters
+        for name in INDEXED_RANGE_FIELDS:
+            if name in ranges:
+                low, high = ranges.pop(name)
+                if low is not None:
+                    query = query.where(name, ">=", low)
+                if high is not None:
+                    query = query.where(name, "<=", high)
+                break
+        sort_direction = firestore.Query.ASCENDING if direction == "asc" else firestore.Query.DESCENDING
+        query = query.order_by(field, direction=sort_direction).order_by("__name__", direction=sort_direction)
+
+        if not page_token and start_after:
+            # Resolve a legacy transaction ID cursor to its position
+            start_doc = db.collection("transactions").document(start_after).get()
+            if not start_doc.exists or start_doc.to_dict().get("semester_id") != semester_id:
+                return jsonify({"error": f"'start_after' ID '{start_after}' not valid for this semester."}), 400
+            page_token = encode_page_token({"v": start_doc.to_dict()[field], "id": start_after})
+        elif not page_token:
+            # Only the first page checks that the semester exists, while the page is being read
+            semester_doc, page = run_parallel(
+                db.collection("semesters").document(semester_id).get,
+                lambda: get_page(query, field, limit, None, fetch_all, ranges, bounds)
+            )
+            if not semester_doc.exists:
+                return jsonify({"error": f"Semester with ID '{semester_id}' not found."}), 404
+            return jsonify(page), 200
 
-        return jsonify({
-            "transactions": transactions,
-            "next_start_after": next_start_after
-        }), 200
+        try:
+            return jsonify(get_page(query, field, limit, page_token, fetch_all, ranges, bounds)), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @transactions_bp.route("/", methods=["POST"])
+@semesters_responses.invalidates
 def create_transaction():
     """Create a new transaction and associate it with a semester."""
     try:
         data = request.get_json()
-        required_fields = ["payer", "time", "message", "amount", "category", "semester_id"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"'{field}' is required."}), 400
-
-        # Validate category
-        if not validate_category(data["category"]):
-            return jsonify({"error": f"Category '{data['category']}' does not exist."}), 400
-
-        # Parse and validate time
-        try:
-            datetime.strptime(data["time"], "%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            return jsonify({"error": "Invalid time format. Use ISO 8601 (e.g., '2025-01-15T12:34:56Z')."}), 400
+        transaction_data, error = parse_transaction(data, category_exists)
+        if error:
+            return jsonify({"error": error}), 400
 
         db = get_firestore_client()
 
-        # Validate semester existence
+        # Create the transaction and update the semester's sequence counter and current capital
         semester_ref = db.collection("semesters").document(data["semester_id"])
-        semester_doc = semester_ref.get()
-        if not semester_doc.exists:
+        transaction_ref = db.collection("transactions").document()
+        seq = add_transaction_to_semester(
+            db.transaction(), db, semester_ref, get_summary_ref(db, data["semester_id"]), transaction_ref, transaction_data
+        )
+        if seq is None:
             return jsonify({"error": f"Semester with ID '{data['semester_id']}' not found."}), 404
 
-        # Create transaction
-        transactions_ref = db.collection("transactions")
-        transaction_data = {
-            "payer": data["payer"],
-            "time": data["time"],
-            "message": data["message"],
-            "amount": float(data["amount"]),
-            "category": data["category"],
-            "semester_id": data["semester_id"]
-        }
-        transaction_doc = transactions_ref.add(transaction_data)
-
-        # Update semester's transactions array and current capital
-        transaction_amount = float(data["amount"])
-        semester_ref.update({
-            "transactions": firestore.ArrayUnion([transaction_doc[1].id]),
-            "current_capital": firestore.Increment(transaction_amount)
-        })
-
         return jsonify({
             "message": "Transaction created and added to semester.",
             "data": {
-                "id": transaction_doc[1].id,
-                **transaction_data
+                "id": transaction_ref.id,
+                **transaction_data,
+                "seq": seq,
+                "version": 1
             }
         }), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def dedupe_document_id(semester_id, dedupe_key):
+    """Derive a stable transaction document ID from a client-supplied dedupe key."""
+    return hashlib.sha256(f"{semester_id}:{dedupe_key}".encode("utf-8")).hexdigest()
+
+def import_chunks(rows):
+    """Group `(row_number, transaction_ref, transaction_data)` rows into chunks that fit one Firestore transaction.
+
+    Each chunk leaves room for the semester, summary and change log writes of every semester it touches.
+    """
+    chunk, semester_ids = [], set()
+    for row in rows:
+        chunk.append(row)
+        semester_ids.add(row[2]["semester_id"])
+        if len(chunk) >= IMPORT_CHUNK_SIZE or len(chunk) + 3 * (len(semester_ids) + 1) > MAX_BATCH_SIZE:
+            yield chunk
+            chunk, semester_ids = [], set()
+    if chunk:
+        yield chunk
+
+@firestore.transactional
+def import_chunk(transaction, db, chunk):
+    """Write a chunk of validated rows atomically, skipping rows whose dedupe key was already imported.
+
+    Each semester in the chunk gets one sequence counter, capital and summary update, and one
+    'imported' change log entry rather than one per row. Returns the number of imported rows, the
+    number of duplicate rows and a list of `(row_number, error)` pairs.
+    """
+    semester_refs = {sid: db.collection("semesters").document(sid) for sid in {data["semester_id"] for _, _, data in chunk}}
+    dedupe_refs = [ref for _, ref, data in chunk if "dedupe_key" in data]
+    docs = {doc.reference.path: doc for doc in transaction.get_all(list(semester_refs.values()) + dedupe_refs)}
+
+    semesters = {}
+    for semester_id, semester_ref in semester_refs.items():
+        semester_doc = docs[semester_ref.path]
+        if semester_doc.exists and not semester_doc.to_dict().get("deleting"):
+            semester_data = semester_doc.to_dict()
+            semesters[semester_id] = {
+                "seq": semester_data.get("transaction_seq", 0),
+                "capital": float(semester_data.get("current_capital", 0.0)),
+                "added": []
+            }
+
+    imported, duplicates, errors, seen = 0, 0, [], set()
+    for row_number, transaction_ref, transaction_data in chunk:
+        semester_id = transaction_data["semester_id"]
+        if semester_id not in semesters:
+            errors.append((row_number, f"Semester with ID '{semester_id}' not found."))
+            continue
+        if transaction_ref.path in seen or (transaction_ref.path in docs and docs[transaction_ref.path].exists):
+            duplicates += 1
+            continue
+        seen.add(transaction_ref.path)
+
+        semester = semesters[semester_id]
+        semester["seq"] += 1
+        semester["added"].append(transaction_data)
+        transaction.set(transaction_ref, {**transaction_data, "seq": semester["seq"], "version": 1})
+        imported += 1
+
+    for semester_id, semester in semesters.items():
+        if not semester["added"]:
+            continue
+        capital_change = sum(data["amount"] for data in semester["added"])
+        transaction.update(semester_refs[semester_id], {
+            "transaction_seq": semester["seq"],
+            "current_capital": firestore.Increment(capital_change)
+        })
+        transaction.set(get_summary_ref(db, semester_id), summary_update(added=semester["added"]), merge=True)
+        record_change(
+            transaction, db, "semester", "imported", semester_id, semester_id,
+            data={"count": len(semester["added"]), "transaction_seq": semester["seq"]},
+            current_capital=semester["capital"] + capital_change
+        )
+
+    return imported, duplicates, errors
+
+@transactions_bp.route("/bulk", methods=["POST"])
+@semesters_responses.invalidates
+def import_transactions():
+    """Import many transactions from a JSON array, NDJSON or CSV body.
+
+    Rows take the same fields as `POST /transactions`, plus an optional `dedupe_key`; a row whose key
+    was already imported into the semester is skipped. Rows without a `semester_id`, or with an
+    empty one, use the `semester_id` query parameter. Every row is validated against one
+    categories snapshot, with one lookup per category name missing from it, and rows are written in
+    atomic chunks of up to `IMPORT_CHUNK_SIZE`.
+    """
+    try:
+        default_semester_id = request.args.get("semester_id")
+        try:
+            rows = read_rows(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        db = get_firestore_client()
+
+        # Check rows against one categories snapshot, looking up each name missing from it only once
+        known_categories, unknown_categories = set(get_category_names()), set()
+
+        def is_category(name):
+            if name not in known_categories and name not in unknown_categories:
+                if category_exists(name):
+                    known_categories.add(name)
+                else:
+                    unknown_categories.add(name)
+            return name in known_categories
+
+        transactions_ref = db.collection("transactions")
+        result = {"imported": 0, "duplicates": 0, "error_count": 0, "errors": []}
+
+        def record_error(row_number, error):
+            result["error_count"] += 1
+            if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                result["errors"].append({"row": row_number, "error": error})
+
+        def valid_rows():
+            for row_number, row, error in rows:
+                if error is None:
+                    if default_semester_id and not row.get("semester_id"):
+                        row["semester_id"] = default_semester_id
+                    transaction_data, error = parse_transaction(row, is_category)
+                if error:
+                    record_error(row_number, error)
+                    continue
+
+                dedupe_key = row.get("dedupe_key")
+                if dedupe_key:
+                    transaction_data["dedupe_key"] = str(dedupe_key)
+                    transaction_ref = transactions_ref.document(dedupe_document_id(transaction_data["semester_id"], dedupe_key))
+                else:
+                    transaction_ref = transactions_ref.document()
+                yield row_number, transaction_ref, transaction_data
+
+        for chunk in import_chunks(valid_rows()):
+            imported, duplicates, errors = import_chunk(db.transaction(), db, chunk)
+            result["imported"] += imported
+            result["duplicates"] += duplicates
+            for row_number, error in errors:
+                record_error(row_number, error)
+
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def parse_transaction_update(data):
+    """Validate a PATCH payload against `TRANSACTION_UPDATE_FIELDS`.
+
+    Returns `(fields, None)` with the converted values, or `(None, error_message)`. The category is
+    not checked against the stored categories here.
+    """
+    if not isinstance(data, dict) or not data:
+        return None, f"Expected an object with any of: {', '.join(TRANSACTION_UPDATE_FIELDS)}."
+    unknown = [field for field in data if field not in TRANSACTION_UPDATE_FIELDS]
+    if unknown:
+        return None, f"Field(s) cannot be updated: {', '.join(unknown)}. Allowed: {', '.join(TRANSACTION_UPDATE_FIELDS)}."
+
+    fields = dict(data)
+    for field in ("payer", "message", "category"):
+        if field in fields and not isinstance(fields[field], str):
+            return None, f"'{field}' must be a string."
+    if "time" in fields:
+        try:
+            datetime.strptime(fields["time"], "%Y-%m-%dT%H:%M:%SZ")
+        except (TypeError, ValueError):
+            return None, "Invalid time format. Use ISO 8601 (e.g., '2025-01-15T12:34:56Z')."
+    if "amount" in fields:
+        try:
+            fields["amount"] = finite_number(fields["amount"])
+        except (TypeError, ValueError):
+            return None, "'amount' must be a finite number."
+    return fields, None
+
+def get_live_semester(transaction, db, semester_id):
+    """Read a transaction's semester within a Firestore transaction.
+
+    Returns its reference and current capital, or None if the semester is missing or being deleted,
+    in which case its capital and summary are left alone.
+    """
+    if not semester_id:
+        return None
+    semester_ref = db.collection("semesters").document(semester_id)
+    semester_doc = semester_ref.get(transaction=transaction)
+    if not semester_doc.exists or semester_doc.to_dict().get("deleting"):
+        return None
+    return semester_ref, float(semester_doc.to_dict().get("current_capital", 0.0))
+
+@firestore.transactional
+def apply_transaction_update(transaction, db, transaction_ref, fields, version):
+    """Update a transaction if it still has the expected version, and return the stored result.
+
+    A changed amount adjusts the semester's current capital by the difference, and a change to a
+    summarized field moves the transaction's contribution within the semester summary. The result
+    is recorded in the change log. Raises NotFound or VersionConflict.
+    """
+    transaction_doc = transaction_ref.get(transaction=transaction)
+    if not transaction_doc.exists:
+        raise NotFound(f"Transaction with ID '{transaction_ref.id}' not found.")
+
+    old_data = transaction_doc.to_dict()
+    current_version = check_version(old_data, version)
+    new_data = {**old_data, **fields, "version": current_version + 1}
+
+    semester_id = old_data.get("semester_id")
+    semester, current_capital = None, None
+    if any(field in fields for field in SUMMARIZED_FIELDS):
+        semester = get_live_semester(transaction, db, semester_id)
+    if semester is not None:
+        semester_ref, capital = semester
+        capital_change = new_data["amount"] - float(old_data["amount"])
+        if capital_change:
+            transaction.update(semester_ref, {"current_capital": firestore.Increment(capital_change)})
+            current_capital = capital + capital_change
+        transaction.set(get_summary_ref(db, semester_id), summary_update(added=[new_data], removed=[old_data]), merge=True)
+
+    transaction.update(transaction_ref, {**fields, "version": current_version + 1})
+    record_change(
+        transaction, db, "transaction", "updated", transaction_ref.id, semester_id, data=new_data,
+        current_capital=current_capital
+    )
+    return new_data
+
 @transactions_bp.route("/<string:transaction_id>", methods=["PATCH"])
+@semesters_responses.invalidates
 def update_transaction(transaction_id):
-    """Update a single field of a transaction."""
+    """Update a transaction's payer, time, message, amount or category.
+
+    The semester's capital and summary follow the change in the same Firestore transaction. Send
+    the transaction's `version` in `If-Match` to have the update rejected with 409 if the
+    transaction changed since it was read.
+    """
     try:
-        data = request.get_json()
-        if "category" in data and not validate_category(data["category"]):
-            return jsonify({"error": f"Category '{data['category']}' does not exist."}), 400
+        fields, error = parse_transaction_update(request.get_json(silent=True))
+        if error:
+            return jsonify({"error": error}), 400
+        if "category" in fields and not category_exists(fields["category"]):
+            return jsonify({"error": f"Category '{fields['category']}' does not exist."}), 400
+        try:
+            version = expected_version()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         db = get_firestore_client()
-        transaction_doc = db.collection("transactions").document(transaction_id)
-
-        if not transaction_doc.get().exists:
+        transaction_ref = db.collection("transactions").document(transaction_id)
+        try:
+            transaction_data = apply_transaction_update(db.transaction(), db, transaction_ref, fields, version)
+        except NotFound:
             return jsonify({"error": f"Transaction with ID '{transaction_id}' not found."}), 404
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "version": e.current_version}), 409
 
-        transaction_doc.update(data)
-        return jsonify({"message": "Transaction updated."}), 200
+        return jsonify({"message": "Transaction updated.", "data": {"id": transaction_id, **transaction_data}}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@firestore.transactional
+def remove_transaction(transaction, db, transaction_ref, version):
+    """Delete a transaction if it still has the expected version, and return its data.
+
+    The transaction's amount is taken back out of its semester's current capital and summary, and
+    the deletion is recorded in the change log. Raises NotFound, VersionConflict, or ValueError if
+    it has no semester.
+    """
+    transaction_doc = transaction_ref.get(transaction=transaction)
+    if not transaction_doc.exists:
+        raise NotFound(f"Transaction with ID '{transaction_ref.id}' not found.")
+
+    transaction_data = transaction_doc.to_dict()
+    check_version(transaction_data, version)
+    semester_id = transaction_data.get("semester_id")
+    if not semester_id:
+        raise ValueError("The transaction is not associated with any semester.")
+
+    semester, current_capital = get_live_semester(transaction, db, semester_id), None
+    if semester is not None:
+        semester_ref, capital = semester
+        transaction.update(semester_ref, {"current_capital": firestore.Increment(-float(transaction_data["amount"]))})
+        transaction.set(get_summary_ref(db, semester_id), summary_update(removed=[transaction_data]), merge=True)
+        current_capital = capital - float(transaction_data["amount"])
+    transaction.delete(transaction_ref)
+    record_change(transaction, db, "transaction", "deleted", transaction_ref.id, semester_id, current_capital=current_capital)
+    return transaction_data
+
 @transactions_bp.route("/<string:transaction_id>", methods=["DELETE"])
+@semesters_responses.invalidates
 def delete_transaction(transaction_id):
-    """Delete a transaction and remove it from the associated semester."""
+    """Delete a transaction and remove it from the associated semester.
+
+    Honors `If-Match` with the transaction's `version` like PATCH does.
+    """
     try:
-        db = get_firestore_client()
+        try:
+            version = expected_version()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Fetch the transaction document
-        transaction_doc = db.collection("transactions").document(transaction_id)
-        if not transaction_doc.get().exists:
+        db = get_firestore_client()
+        transaction_ref = db.collection("transactions").document(transaction_id)
+        try:
+            transaction_data = remove_transaction(db.transaction(), db, transaction_ref, version)
+        except NotFound:
             return jsonify({"error": f"Transaction with ID '{transaction_id}' not found."}), 404
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "version": e.current_version}), 409
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Get transaction data to find the associated semester
-        transaction_data = transaction_doc.get().to_dict()
-        semester_id = transaction_data.get("semester_id")
-        if not semester_id:
-            return jsonify({"error": "The transaction is not associated with any semester."}), 400
-
-        # Remove the transaction from the semester's transactions array
-        semester_ref = db.collection("semesters").document(semester_id)
-        semester_doc = semester_ref.get()
-        if semester_doc.exists:
-            transaction_amount = float(transaction_data["amount"])
-            semester_ref.update({
-                "transactions": firestore.ArrayRemove([transaction_id]),
-                "current_capital": firestore.Increment(-transaction_amount)
-            })
-
-        # Delete the transaction document
-        transaction_doc.delete()
-
+        semester_id = transaction_data["semester_id"]
         return jsonify({"message": f"Transaction with ID '{transaction_id}' deleted and removed from semester '{semester_id}'."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
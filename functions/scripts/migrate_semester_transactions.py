@@ -0,0 +1,63 @@
+"""One-time migration from the semester `transactions` ID array to per-transaction sequence numbers.
+
+Each transaction listed in a semester's `transactions` array gets `seq` set to its 1-based position
+in that array, the semester gets `transaction_seq` set to the array length, and the array is removed
+from the semester document. Semesters that have already been migrated are skipped, and re-running
+after an interruption is safe.
+
+Run from the `functions` directory before deploying the API version that reads `seq`:
+
+    python scripts/migrate_semester_transactions.py [--dry-run]
+"""
+
+import argparse
+import os
+
+from firebase_admin import initialize_app, credentials, firestore
+
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+
+def migrate_semester(db, semester_doc, dry_run=False):
+    """Assign sequence numbers to one semester's transactions and drop its ID array."""
+    transaction_ids = semester_doc.to_dict().get("transactions")
+    if transaction_ids is None:
+        return 0
+
+    transactions_ref = db.collection("transactions")
+    migrated = 0
+    for batch_start in range(0, len(transaction_ids), BATCH_SIZE):
+        batch_ids = transaction_ids[batch_start:batch_start + BATCH_SIZE]
+        refs = [transactions_ref.document(transaction_id) for transaction_id in batch_ids]
+        existing = {doc.id for doc in db.get_all(refs) if doc.exists}
+
+        batch = db.batch()
+        for offset, ref in enumerate(refs):
+            if ref.id in existing:
+                batch.update(ref, {"seq": batch_start + offset + 1, "semester_id": semester_doc.id})
+                migrated += 1
+        if not dry_run:
+            batch.commit()
+
+    if not dry_run:
+        semester_doc.reference.update({
+            "transaction_seq": len(transaction_ids),
+            "transactions": firestore.DELETE_FIELD
+        })
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    initialize_app(credentials.Certificate("serviceAccountKey.json"))
+    db = firestore.client()
+
+    for semester_doc in db.collection("semesters").stream():
+        migrated = migrate_semester(db, semester_doc, dry_run=args.dry_run)
+        print(f"Semester '{semester_doc.id}': {migrated} transactions migrated.")
+
+if __name__ == "__main__":
+    main()
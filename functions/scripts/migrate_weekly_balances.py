@@ -0,0 +1,56 @@
+"""One-time migration of the semester `weekly_balance` arrays into per-semester subcollections.
+
+Each entry of a semester's `weekly_balance` array becomes the document
+`semesters/<semester_id>/weekly_balance/<date>`, and the array is removed from the semester
+document. When the array holds several entries for one date, the last one wins, as it does for new
+entries. Semesters that have already been migrated are skipped, and re-running after an
+interruption is safe.
+
+Run from the `functions` directory before deploying the API version that reads the subcollection:
+
+    python scripts/migrate_weekly_balances.py [--dry-run]
+"""
+
+import argparse
+import os
+
+from firebase_admin import initialize_app, credentials, firestore
+
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+
+def migrate_semester(db, semester_doc, dry_run=False):
+    """Copy one semester's weekly balance entries into its subcollection and drop the array."""
+    entries = semester_doc.to_dict().get("weekly_balance")
+    if entries is None:
+        return 0
+
+    by_date = {entry["date"]: entry for entry in entries if "date" in entry and "value" in entry}
+    balances_ref = semester_doc.reference.collection("weekly_balance")
+    dates = sorted(by_date)
+    for batch_start in range(0, len(dates), BATCH_SIZE):
+        batch = db.batch()
+        for date in dates[batch_start:batch_start + BATCH_SIZE]:
+            batch.set(balances_ref.document(date), {"date": date, "value": float(by_date[date]["value"])})
+        if not dry_run:
+            batch.commit()
+
+    if not dry_run:
+        semester_doc.reference.update({"weekly_balance": firestore.DELETE_FIELD})
+    return len(dates)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    initialize_app(credentials.Certificate("serviceAccountKey.json"))
+    db = firestore.client()
+
+    for semester_doc in db.collection("semesters").stream():
+        migrated = migrate_semester(db, semester_doc, dry_run=args.dry_run)
+        print(f"Semester '{semester_doc.id}': {migrated} weekly balance entries migrated.")
+
+if __name__ == "__main__":
+    main()
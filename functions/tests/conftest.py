@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+sys.path.insert(0, os.path.join(FUNCTIONS_DIR, "benchmarks"))
+
+import fake_firestore
+from firebase_admin import firestore
+
+# The route modules apply `firestore.transactional` when imported, so swap it in first
+firestore.transactional = fake_firestore.transactional
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory Firestore behind `firestore.client()`, with the process caches emptied."""
+    import utils.db
+    from routes.categories import categories_cache, categories_responses
+    from routes.reimbursements import reimbursements_responses
+    from routes.semesters import semesters_responses
+
+    client = fake_firestore.Client()
+    monkeypatch.setattr(firestore, "client", lambda app=None, database_id=None: client)
+    monkeypatch.setattr(utils.db, "_client", None)
+    categories_cache.clear()
+    for responses in (categories_responses, reimbursements_responses, semesters_responses):
+        responses.invalidate()
+    return client
+
+@pytest.fixture
+def api(db):
+    """A test client for the API, backed by the `db` fixture."""
+    from app import create_app
+    return create_app().test_client()
@@ -0,0 +1,40 @@
+"""Helpers shared by the API tests."""
+
+from utils.aggregates import get_summary_ref, summary_totals
+
+SEMESTER = {"name": "Spring", "date": "2025-01-06", "starting_capital": 1000, "active_house_size": 40, "insurance_cost": 25}
+
+def create_semester(api, **overrides):
+    response = api.post("/semesters/", json={**SEMESTER, **overrides})
+    assert response.status_code == 201
+    return response.get_json()["data"]["id"]
+
+def create_category(api, name):
+    assert api.post("/categories/", json={"name": name}).status_code == 201
+
+def create_transaction(api, semester_id, amount, category="Food", payer="Ann", time="2025-01-07T12:00:00Z"):
+    response = api.post("/transactions/", json={
+        "payer": payer, "time": time, "message": "Test", "amount": amount, "category": category, "semester_id": semester_id
+    })
+    assert response.status_code == 201
+    return response.get_json()["data"]
+
+def normalized(summary):
+    """Round the totals and drop map entries that have gone back to zero."""
+    result = {}
+    for field in ("count", "total", "by_category", "by_payer", "by_week"):
+        value = summary.get(field, {} if field.startswith("by_") else 0)
+        if isinstance(value, dict):
+            result[field] = {key: round(amount, 6) for key, amount in value.items() if round(amount, 6)}
+        else:
+            result[field] = round(value, 6)
+    return result
+
+def assert_consistent(db, semester_id):
+    """Check the stored capital and summary against the semester's transactions."""
+    transactions = [doc.to_dict() for doc in db.collection("transactions").where("semester_id", "==", semester_id).stream()]
+    semester = db.collection("semesters").document(semester_id).get().to_dict()
+    assert round(semester["current_capital"], 6) == round(semester["starting_capital"] + sum(t["amount"] for t in transactions), 6)
+
+    summary = get_summary_ref(db, semester_id).get().to_dict()
+    assert normalized(summary) == normalized(summary_totals(added=transactions))
@@ -0,0 +1,19 @@
+from helpers import assert_consistent, create_category, create_semester, create_transaction
+
+def test_create_update_and_delete_keep_capital_and_summary(api, db):
+    create_category(api, "Food")
+    create_category(api, "Rent")
+    semester_id = create_semester(api)
+
+    first = create_transaction(api, semester_id, 120.5)
+    second = create_transaction(api, semester_id, -40, category="Rent", payer="Bob", time="2025-01-20T08:00:00Z")
+    assert_consistent(db, semester_id)
+
+    response = api.patch(f"/transactions/{first['id']}", json={"amount": 80, "category": "Rent", "time": "2025-02-03T00:00:00Z"})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["version"] == 2
+    assert_consistent(db, semester_id)
+
+    assert api.delete(f"/transactions/{second['id']}").status_code == 200
+    assert_consistent(db, semester_id)
+    assert db.collection("semesters").document(semester_id).get().to_dict()["current_capital"] == 1080
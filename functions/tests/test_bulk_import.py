@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from helpers import assert_consistent, create_category, create_semester
+
+def test_bulk_import_updates_capital_and_summary(api, db):
+    create_category(api, "Food")
+    create_category(api, "Rent")
+    semester_ids = [create_semester(api), create_semester(api, starting_capital=0)]
+
+    # Enough rows to span several import chunks, some of them repeated through their dedupe key
+    rows = [
+        {
+            "payer": f"Member {i % 3}", "time": f"2025-01-{1 + i % 28:02d}T10:00:00Z", "message": f"Row {i}",
+            "amount": (i % 7) - 2.5, "category": ("Food", "Rent")[i % 2], "semester_id": semester_ids[i % 2],
+            "dedupe_key": f"row-{i % 800}"
+        }
+        for i in range(900)
+    ]
+    response = api.post("/transactions/bulk", data="\n".join(json.dumps(row) for row in rows), content_type="application/x-ndjson")
+    assert response.status_code == 200
+    assert response.get_json() == {"imported": 800, "duplicates": 100, "error_count": 0, "errors": []}
+
+    for semester_id in semester_ids:
+        assert_consistent(db, semester_id)
+        semester = db.collection("semesters").document(semester_id).get().to_dict()
+        assert semester["transaction_seq"] == 400
+
+def test_bulk_import_uses_default_semester_for_blank_cells(api, db):
+    create_category(api, "Food")
+    semester_id = create_semester(api)
+    body = "payer,time,message,amount,category,semester_id\nAnn,2025-01-07T00:00:00Z,Lunch,12,Food,\n"
+
+    response = api.post(f"/transactions/bulk?semester_id={semester_id}", data=body, content_type="text/csv")
+    assert response.status_code == 200
+    assert response.get_json()["imported"] == 1
+    assert_consistent(db, semester_id)
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "-Infinity", True])
+def test_non_finite_amounts_are_rejected(api, db, amount):
+    create_category(api, "Food")
+    semester_id = create_semester(api)
+    row = {"payer": "Ann", "time": "2025-01-07T12:00:00Z", "message": "Test", "category": "Food", "semester_id": semester_id}
+
+    response = api.post("/transactions/", json={**row, "amount": amount})
+    assert response.status_code == 400
+
+    # A bulk import reports the row and still imports the valid ones
+    body = "\n".join(json.dumps({**row, "amount": value}) for value in (12, amount))
+    response = api.post("/transactions/bulk", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["imported"] == 1
+    assert result["errors"] == [{"row": 2, "error": "'amount' must be a finite number."}]
+    assert_consistent(db, semester_id)
@@ -0,0 +1,49 @@
+import routes.categories
+from helpers import assert_consistent, create_category, create_semester, create_transaction, normalized
+from utils.aggregates import get_summary_ref
+
+def test_category_delete_moves_amounts_to_uncategorized(api, db):
+    for name in ("Food", "Rent", "Uncategorized"):
+        create_category(api, name)
+    semester_id = create_semester(api)
+    create_transaction(api, semester_id, 15, category="Rent")
+    create_transaction(api, semester_id, 10, category="Food")
+    create_transaction(api, semester_id, 5, category="Uncategorized")
+
+    response = api.delete("/categories/Food")
+    assert response.status_code == 200
+    assert response.get_json()["reassigned"] == 1
+    assert_consistent(db, semester_id)
+    assert normalized(get_summary_ref(db, semester_id).get().to_dict())["by_category"] == {"Rent": 15, "Uncategorized": 15}
+
+def test_uncategorized_cannot_be_deleted(api, db):
+    create_category(api, "Uncategorized")
+    semester_id = create_semester(api)
+    transaction = create_transaction(api, semester_id, 10, category="Uncategorized")
+
+    assert api.delete("/categories/Uncategorized").status_code == 400
+    assert db.collection("transactions").document(transaction["id"]).get().to_dict()["version"] == 1
+    assert_consistent(db, semester_id)
+
+def test_category_delete_keeps_concurrent_edits(api, db, monkeypatch):
+    for name in ("Food", "Rent", "Uncategorized"):
+        create_category(api, name)
+    semester_id = create_semester(api)
+    moved = create_transaction(api, semester_id, 10)
+    changed = create_transaction(api, semester_id, 20)
+    create_transaction(api, semester_id, 30)
+
+    # Edit two of the transactions after the delete has queried them but before it reassigns them
+    reassign_chunk = routes.categories.reassign_chunk
+    def edit_then_reassign(transaction, db, category_name, transaction_refs):
+        assert api.patch(f"/transactions/{moved['id']}", json={"category": "Rent"}).status_code == 200
+        assert api.patch(f"/transactions/{changed['id']}", json={"amount": 25}).status_code == 200
+        return reassign_chunk(transaction, db, category_name, transaction_refs)
+    monkeypatch.setattr(routes.categories, "reassign_chunk", edit_then_reassign)
+
+    response = api.delete("/categories/Food")
+    assert response.status_code == 200
+    assert response.get_json()["reassigned"] == 2
+    assert db.collection("transactions").document(moved["id"]).get().to_dict()["category"] == "Rent"
+    assert_consistent(db, semester_id)
+    assert normalized(get_summary_ref(db, semester_id).get().to_dict())["by_category"] == {"Rent": 10, "Uncategorized": 55}
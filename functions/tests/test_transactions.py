@@ -0,0 +1,59 @@
+import itertools
+import json
+import os
+
+import pytest
+
+from helpers import create_category, create_semester
+from routes.transactions import INDEXED_RANGE_FIELDS, MAX_SCAN_ROWS, MIN_SCAN_BATCH, ORDER_FIELDS
+
+INDEXES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "firestore.indexes.json")
+
+@pytest.fixture
+def semester_id(api):
+    """A semester with 3,000 small transactions and a single one of 500."""
+    create_category(api, "Food")
+    create_category(api, "Rent")
+    semester_id = create_semester(api)
+    rows = [
+        {
+            "payer": "Ann", "time": f"2025-01-{1 + i % 28:02d}T10:00:00Z", "message": f"Row {i}",
+            "amount": 500 if i == 2999 else i % 50, "category": ("Food", "Rent")[i % 2], "semester_id": semester_id
+        }
+        for i in range(3000)
+    ]
+    response = api.post("/transactions/bulk", data="\n".join(json.dumps(row) for row in rows), content_type="application/x-ndjson")
+    assert response.get_json()["imported"] == 3000
+    return semester_id
+
+def test_equality_and_range_filters_run_in_one_query(api, db, semester_id):
+    before = db.ops.snapshot()
+    response = api.get(f"/transactions/?semester_id={semester_id}&category=Rent&amount_min=500&limit=1")
+    assert response.status_code == 200
+    assert [t["amount"] for t in response.get_json()["transactions"]] == [500]
+
+    # One query for the page and one read of the semester
+    assert db.ops.rpcs - before["rpcs"] == 2
+
+def test_sparse_scans_take_few_round_trips(api, db, semester_id):
+    # The time range runs in the query and the amount range is applied while scanning
+    before = db.ops.snapshot()
+    response = api.get(f"/transactions/?semester_id={semester_id}&time_from=2025-01-01T00:00:00Z&amount_min=1000&limit=1")
+    assert response.status_code == 200
+    page = response.get_json()
+    assert page["transactions"] == [] and page["next_page_token"]
+    assert db.ops.rpcs - before["rpcs"] <= 1 + MAX_SCAN_ROWS // MIN_SCAN_BATCH
+
+def test_every_filtered_query_has_an_index():
+    with open(INDEXES_PATH) as f:
+        indexes = {
+            tuple((field["fieldPath"], field["order"]) for field in index["fields"])
+            for index in json.load(f)["indexes"] if index["collectionGroup"] == "transactions"
+        }
+
+    for equalities in ([], ["category"], ["payer"], ["category", "payer"]):
+        for sort_field, direction, range_field in itertools.product(ORDER_FIELDS.values(), ("ASCENDING", "DESCENDING"), INDEXED_RANGE_FIELDS):
+            if range_field == sort_field:
+                continue
+            fields = [("semester_id", "ASCENDING")] + [(name, "ASCENDING") for name in equalities]
+            assert tuple(fields + [(sort_field, direction), (range_field, "ASCENDING")]) in indexes
@@ -0,0 +1,69 @@
+import pytest
+
+from helpers import assert_consistent, create_category, create_semester, create_transaction
+
+def test_starting_capital_change_keeps_transaction_capital(api, db):
+    create_category(api, "Food")
+    semester_id = create_semester(api)
+    create_transaction(api, semester_id, 50)
+
+    response = api.patch(f"/semesters/{semester_id}", json={"starting_capital": 2000}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["current_capital"] == 2050
+    assert_consistent(db, semester_id)
+
+def test_stale_if_match_returns_409(api, db):
+    create_category(api, "Food")
+    semester_id = create_semester(api)
+    transaction = create_transaction(api, semester_id, 10)
+
+    assert api.patch(f"/transactions/{transaction['id']}", json={"amount": 20}, headers={"If-Match": '"1"'}).status_code == 200
+    stale = api.patch(f"/transactions/{transaction['id']}", json={"amount": 30}, headers={"If-Match": '"1"'})
+    assert stale.status_code == 409
+    assert stale.get_json()["version"] == 2
+    assert api.delete(f"/transactions/{transaction['id']}", headers={"If-Match": '"1"'}).status_code == 409
+
+    assert api.patch(f"/semesters/{semester_id}", json={"name": "Fall"}, headers={"If-Match": '"1"'}).status_code == 200
+    assert api.patch(f"/semesters/{semester_id}", json={"starting_capital": 5}, headers={"If-Match": '"1"'}).status_code == 409
+
+    # The rejected writes changed nothing
+    assert db.collection("transactions").document(transaction["id"]).get().to_dict()["amount"] == 20
+    assert_consistent(db, semester_id)
+
+@pytest.mark.parametrize("field, value", [
+    ("starting_capital", "nan"),
+    ("insurance_cost", "inf"),
+    ("active_house_size", 3.7),
+    ("active_house_size", True),
+])
+def test_semester_update_rejects_invalid_numbers(api, db, field, value):
+    semester_id = create_semester(api)
+
+    response = api.patch(f"/semesters/{semester_id}", json={field: value})
+    assert response.status_code == 400
+    assert db.collection("semesters").document(semester_id).get().to_dict()["version"] == 1
+    assert api.get(f"/semesters/{semester_id}").status_code == 200
+
+@pytest.mark.parametrize("amount", ["nan", "-inf", False])
+def test_transaction_update_rejects_invalid_amounts(api, db, amount):
+    create_category(api, "Food")
+    semester_id = create_semester(api)
+    transaction = create_transaction(api, semester_id, 10)
+
+    assert api.patch(f"/transactions/{transaction['id']}", json={"amount": amount}).status_code == 400
+    assert_consistent(db, semester_id)
+
+def test_semester_etag_is_accepted_as_if_match(api, db):
+    semester_id = create_semester(api)
+
+    read = api.get(f"/semesters/{semester_id}?fields=name")
+    etag = read.headers["ETag"]
+    assert "version" not in read.get_json()
+    assert api.get(f"/semesters/{semester_id}?fields=name", headers={"If-None-Match": etag}).status_code == 304
+
+    assert api.patch(f"/semesters/{semester_id}", json={"name": "Fall"}, headers={"If-Match": etag}).status_code == 200
+    assert api.patch(f"/semesters/{semester_id}", json={"name": "Summer"}, headers={"If-Match": etag}).status_code == 409
+
+    # The new ETag reflects the new version
+    etag = api.get(f"/semesters/{semester_id}?fields=name").headers["ETag"]
+    assert api.patch(f"/semesters/{semester_id}", json={"name": "Summer"}, headers={"If-Match": etag}).status_code == 200
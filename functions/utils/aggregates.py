@@ -0,0 +1,63 @@
+from datetime import datetime
+from firebase_admin import firestore
+
+# Label used for map keys when a transaction field is empty, since Firestore rejects empty field names
+UNKNOWN_KEY = "Unknown"
+
+def get_summary_ref(db, semester_id):
+    """Return the reference of the semester's precomputed summary document."""
+    return db.collection("semester_summaries").document(semester_id)
+
+def iso_week_label(day):
+    """Return the ISO week label (e.g. '2025-W03') of a date or datetime."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def iso_week(time):
+    """Return the ISO week label (e.g. '2025-W03') of a transaction time string."""
+    return iso_week_label(datetime.strptime(time, "%Y-%m-%dT%H:%M:%SZ"))
+
+def summary_totals(added=(), removed=()):
+    """Sum the given transactions into summary totals, counting `removed` ones negatively."""
+    totals = {"count": 0, "total": 0.0, "by_category": {}, "by_payer": {}, "by_week": {}}
+    for sign, transactions in ((1, added), (-1, removed)):
+        for transaction_data in transactions:
+            amount = sign * float(transaction_data["amount"])
+            totals["count"] += sign
+            totals["total"] += amount
+            for field, key in (
+                ("by_category", transaction_data.get("category")),
+                ("by_payer", transaction_data.get("payer")),
+                ("by_week", iso_week(transaction_data["time"]))
+            ):
+                key = key or UNKNOWN_KEY
+                totals[field][key] = totals[field].get(key, 0.0) + amount
+    return totals
+
+def summary_update(added=(), removed=()):
+    """Build a `set(..., merge=True)` payload that applies the transactions to a summary with Increments."""
+    return {
+        field: {key: firestore.Increment(value) for key, value in value.items()}
+        if isinstance(value, dict) else firestore.Increment(value)
+        for field, value in summary_totals(added, removed).items()
+    }
+
+def empty_summary():
+    """Return the summary document of a semester without transactions."""
+    return {**summary_totals(), "built": True}
+
+@firestore.transactional
+def rebuild_summary(transaction, db, semester_id):
+    """Recompute a semester's summary from its transactions and store it.
+
+    Used once for semesters created before summaries were kept incrementally.
+    """
+    query = (
+        db.collection("transactions")
+        .where("semester_id", "==", semester_id)
+        .select(["amount", "category", "payer", "time"])
+    )
+    transactions = [doc.to_dict() for doc in transaction.get(query)]
+    summary = {**summary_totals(added=transactions), "built": True}
+    transaction.set(get_summary_ref(db, semester_id), summary)
+    return summary
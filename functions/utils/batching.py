@@ -0,0 +1,70 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+
+# Number of batches committed concurrently
+MAX_PARALLEL_BATCHES = 8
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items from `iterable` without materializing it."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_batch(db, writes):
+    """Commit a list of (op, reference, data) writes as one atomic batch.
+
+    `op` is one of 'set', 'merge' (set with merge=True), 'update' or 'delete'.
+    """
+    if len(writes) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} writes.")
+    batch = db.batch()
+    for op, reference, data in writes:
+        if op == "set":
+            batch.set(reference, data)
+        elif op == "merge":
+            batch.set(reference, data, merge=True)
+        elif op == "update":
+            batch.update(reference, data)
+        elif op == "delete":
+            batch.delete(reference)
+        else:
+            raise ValueError(f"Unknown write operation '{op}'.")
+    batch.commit()
+    return len(writes)
+
+def map_parallel(function, items, max_workers=MAX_PARALLEL_BATCHES):
+    """Call `function` on each item of `items`, keeping up to `max_workers` calls in flight.
+
+    `items` may be a generator; it is consumed lazily so only the in-flight items are held in
+    memory. Returns the results in completion order. The first failed call is re-raised once the
+    in-flight calls have finished.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        try:
+            for item in items:
+                if len(in_flight) >= max_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+                in_flight.add(executor.submit(contextvars.copy_context().run, function, item))
+        finally:
+            done, _ = wait(in_flight)
+        results.extend(future.result() for future in done)
+    return results
+
+def commit_batches(db, batches, max_workers=MAX_PARALLEL_BATCHES):
+    """Commit each list of writes from `batches` atomically, keeping up to `max_workers` commits in flight.
+
+    Returns a dict with the number of batches and writes committed.
+    """
+    written = map_parallel(lambda writes: write_batch(db, writes), batches, max_workers)
+    return {"batches": len(written), "writes": sum(written)}
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from utils.pagination import encode_page_token, decode_page_token
+
+# Collection of change entries read by the /changes feed
+CHANGES_COLLECTION = "changes"
+
+# Entries are kept this long (through a Firestore TTL policy on `expires_at`); older cursors must resync
+CHANGE_RETENTION = timedelta(days=7)
+
+# How far a caught-up cursor trails the clock, to cover skew between this instance and Firestore
+CLOCK_SKEW_MARGIN = timedelta(seconds=30)
+
+def change_entry(entity, op, entity_id, semester_id=None, data=None, current_capital=None):
+    """Build a change entry describing one created, updated or deleted document.
+
+    `data` holds the document's fields after the change and `current_capital` the semester's capital
+    after it, when the change moved it. The entry is ordered by its commit time.
+    """
+    entry = {
+        "at": firestore.SERVER_TIMESTAMP,
+        "expires_at": datetime.now(timezone.utc) + CHANGE_RETENTION,
+        "entity": entity,
+        "op": op,
+        "id": entity_id,
+        "semester_id": semester_id
+    }
+    if data is not None:
+        entry["data"] = data
+    if current_capital is not None:
+        entry["current_capital"] = current_capital
+    return entry
+
+def get_change_ref(db):
+    """Return a reference for a new change entry."""
+    return db.collection(CHANGES_COLLECTION).document()
+
+def record_change(writer, db, *args, **kwargs):
+    """Add a change entry to a write batch or Firestore transaction, so it commits with the change."""
+    writer.set(get_change_ref(db), change_entry(*args, **kwargs))
+
+def encode_cursor(at, change_id=""):
+    """Encode a feed position as an opaque cursor.
+
+    A position is the commit time and ID of the last change seen; an empty ID stands for a point in
+    time between changes.
+    """
+    return encode_page_token({"at": at.isoformat(), "id": change_id})
+
+def decode_cursor(cursor):
+    """Decode a feed cursor into `(at, change_id)`, raising ValueError if it is malformed."""
+    try:
+        position = decode_page_token(cursor)
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(position.get("at"), str) or not isinstance(position.get("id"), str):
+        raise ValueError("Invalid cursor.")
+    try:
+        at = datetime.fromisoformat(position["at"])
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+    if at.tzinfo is None:
+        raise ValueError("Invalid cursor.")
+    return at, position["id"]
+
+def current_position():
+    """Return a position every change already visible to a read is before.
+
+    It trails the clock by `CLOCK_SKEW_MARGIN`, so a change committed just before the read but
+    stamped by a slightly faster clock is still delivered, possibly twice.
+    """
+    return datetime.now(timezone.utc) - CLOCK_SKEW_MARGIN, ""
+
+def is_expired(position):
+    """Check whether entries after the position may already have been removed by the TTL policy."""
+    return position[0] < datetime.now(timezone.utc) - CHANGE_RETENTION
+
+def read_changes(db, semester_id, position, limit):
+    """Read up to `limit` change entries committed after `position`, optionally for one semester.
+
+    Returns `(changes, position)`. Each change carries the `cursor` of its own position; the
+    returned position is that of the last change, moved up to `current_position()` once the feed
+    has caught up so idle cursors do not age out.
+    """
+    at, change_id = position
+    query = db.collection(CHANGES_COLLECTION)
+    if semester_id:
+        query = query.where("semester_id", "==", semester_id)
+    query = query.order_by("at").order_by("__name__")
+    query = query.start_after({"at": at, "__name__": change_id} if change_id else {"at": at})
+
+    changes = []
+    for doc in query.limit(limit).stream():
+        change = doc.to_dict()
+        position = (change.pop("at"), doc.id)
+        change.pop("expires_at", None)
+        changes.append({"cursor": encode_cursor(*position), **change})
+    if len(changes) < limit:
+        position = max(position, current_position())
+    return changes, position
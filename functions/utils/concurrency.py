@@ -0,0 +1,20 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Shared pool for independent reads issued by request handlers
+MAX_FANOUT_WORKERS = 32
+
+_executor = ThreadPoolExecutor(max_workers=MAX_FANOUT_WORKERS, thread_name_prefix="fanout")
+
+def run_parallel(*calls):
+    """Run independent zero-argument callables concurrently and return their results in order.
+
+    The first callable runs on the calling thread and the rest on the shared pool, each in a copy of
+    the caller's context. Every call finishes before the first exception raised, if any, propagates.
+    """
+    futures = [_executor.submit(contextvars.copy_context().run, call) for call in calls[1:]]
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first] + [future.result() for future in futures]
@@ -0,0 +1,19 @@
+import threading
+from firebase_admin import firestore
+from utils.metrics import instrument_client
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_firestore_client():
+    """Return the process-wide Firestore client, instrumented for the per-request metrics.
+
+    `firestore.client()` already returns one cached client per Firebase app; this keeps the single
+    instrumented wrapper around it, created on first use once the Firebase app is initialized.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = instrument_client(firestore.client())
+    return _client
@@ -0,0 +1,67 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+from flask import request, make_response
+from utils.cache import TTLCache
+
+class ResponseCache:
+    """Process-local cache of successful GET responses, served with strong ETags.
+
+    Entries are keyed by route and query string. A view serving a versioned document can tag its
+    response with the version (`response.set_etag(str(version))`); the ETag is then
+    `"<version>.<digest>"`, which PATCH routes accept in `If-Match` (see `expected_version`). Views
+    that change the underlying data are wrapped with `invalidates` so the next read rebuilds the
+    response. Other function instances only see a
+    write once their copy expires, so `ttl` bounds how stale a read can be.
+    """
+
+    def __init__(self, maxsize=256, ttl=30, max_age=0):
+        self.max_age = max_age
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def cache_key():
+        """Build the cache key for the current request from its path and sorted query parameters."""
+        return f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+    def cached(self, view):
+        """Serve the view from the cache and answer matching `If-None-Match` requests with 304."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = self.cache_key()
+            entry = self._cache.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                version, _ = response.get_etag()
+                digest = hashlib.sha256(body).hexdigest()
+                entry = (body, response.mimetype, f"{version}.{digest}" if version else digest)
+                self._cache.set(key, entry)
+
+            body, mimetype, etag = entry
+            response = make_response(body, 200)
+            response.mimetype = mimetype
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = f"private, max-age={self.max_age}, must-revalidate"
+            return response.make_conditional(request)
+        return wrapper
+
+    def invalidates(self, view):
+        """Clear the cache after the view runs, whether or not the write succeeded."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                return view(*args, **kwargs)
+            finally:
+                self.invalidate()
+        return wrapper
+
+    def invalidate(self):
+        """Drop every cached response."""
+        self._cache.clear()
+
+    def stats(self):
+        """Return hit/miss counts and the current size."""
+        return self._cache.stats()
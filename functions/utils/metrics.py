@@ -0,0 +1,219 @@
+import bisect
+import collections
+import contextvars
+import os
+import sys
+import threading
+import time
+from flask import g, request
+from utils.structured_log import log_event
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Firestore RPCs counted per request, and the response field that marks each document read
+COUNTED_RPCS = {
+    "batch_get_documents": ("found", "missing"),
+    "run_query": ("document",),
+    "run_aggregation_query": (),
+    "commit": (),
+    "batch_write": (),
+    "begin_transaction": (),
+    "rollback": (),
+    "list_documents": (),
+    "list_collection_ids": (),
+    "partition_query": ()
+}
+
+# Requests slower than this many ms get their sampled stacks logged; unset disables the profiler
+PROFILE_SLOW_MS = os.environ.get("API_PROFILE_SLOW_MS")
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("API_PROFILE_INTERVAL_MS", "5")) / 1000
+
+_request_ops = contextvars.ContextVar("firestore_ops", default=None)
+
+class FirestoreOps:
+    """Thread-safe counters of the Firestore reads, writes and RPCs made for one request."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+        self._lock = threading.Lock()
+
+    def add(self, reads=0, writes=0, rpcs=0):
+        with self._lock:
+            self.reads += reads
+            self.writes += writes
+            self.rpcs += rpcs
+
+def count_responses(responses, ops, read_fields):
+    """Pass through a streaming RPC response, counting one read per response that carries a document."""
+    for response in responses:
+        if any(field in response for field in read_fields):
+            ops.add(reads=1)
+        yield response
+
+def counted_rpc(name, method):
+    """Wrap a Firestore GAPIC method so calls made during a request are counted."""
+    read_fields = COUNTED_RPCS[name]
+
+    def wrapper(*args, **kwargs):
+        ops = _request_ops.get()
+        if ops is None:
+            return method(*args, **kwargs)
+
+        ops.add(rpcs=1)
+        rpc_request = kwargs.get("request", args[0] if args else None)
+        if name in ("commit", "batch_write") and rpc_request is not None:
+            writes = rpc_request["writes"] if isinstance(rpc_request, dict) else rpc_request.writes
+            ops.add(writes=len(writes))
+        elif name == "run_aggregation_query":
+            ops.add(reads=1)
+
+        result = method(*args, **kwargs)
+        if read_fields:
+            return count_responses(result, ops, read_fields)
+        return result
+    return wrapper
+
+def instrument_client(client):
+    """Wrap the client's Firestore RPCs so every request counts the reads, writes and RPCs it makes.
+
+    Relies on the client's private `_firestore_api` GAPIC client; if that is unavailable the client
+    is left as is and requests report zero Firestore operations.
+    """
+    try:
+        api = client._firestore_api
+    except AttributeError:
+        return client
+    for name in COUNTED_RPCS:
+        method = getattr(api, name, None)
+        if method is not None:
+            setattr(api, name, counted_rpc(name, method))
+    return client
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with a running count and sum."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def record(self, duration_ms):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+
+    def snapshot(self):
+        bounds = list(LATENCY_BUCKETS_MS) + [None]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "buckets": [{"le_ms": bound, "count": count} for bound, count in zip(bounds, self.buckets)]
+        }
+
+_histograms = collections.defaultdict(LatencyHistogram)
+_histograms_lock = threading.Lock()
+
+def record_latency(blueprint, route, duration_ms):
+    """Record a request's latency in its blueprint's and its route's histograms."""
+    with _histograms_lock:
+        _histograms[("blueprint", blueprint or "app")].record(duration_ms)
+        _histograms[("route", route or "unmatched")].record(duration_ms)
+
+def latency_snapshot():
+    """Return the latency histograms recorded by this process, grouped by blueprint and by route."""
+    with _histograms_lock:
+        snapshot = {"blueprints": {}, "routes": {}}
+        for (kind, name), histogram in sorted(_histograms.items()):
+            snapshot[f"{kind}s"][name] = histogram.snapshot()
+        return snapshot
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_filename}:{frame.f_lineno}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def hot_stacks(self, top=5):
+        return [{"samples": samples, "stack": list(stack)} for stack, samples in self.stacks.most_common(top)]
+
+def init_app(app):
+    """Time every request, count its Firestore operations, and report them in a log line and headers."""
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_ops = FirestoreOps()
+        g.metrics_token = _request_ops.set(g.metrics_ops)
+        g.metrics_sampler = StackSampler(threading.get_ident()).start() if PROFILE_SLOW_MS else None
+
+    @app.after_request
+    def report_request_metrics(response):
+        if "metrics_started" not in g:
+            return response
+        duration_ms = (time.perf_counter() - g.metrics_started) * 1000
+        ops = g.metrics_ops
+        route = request.url_rule.rule if request.url_rule else None
+        record_latency(request.blueprint, route, duration_ms)
+
+        response.headers["Server-Timing"] = (
+            f"app;dur={duration_ms:.1f}, "
+            f"firestore-reads;desc=\"{ops.reads}\", "
+            f"firestore-writes;desc=\"{ops.writes}\", "
+            f"firestore-rpcs;desc=\"{ops.rpcs}\""
+        )
+        response.headers["Timing-Allow-Origin"] = "*"
+
+        fields = {}
+        sampler = g.pop("metrics_sampler", None)
+        if sampler is not None:
+            sampler.stop()
+            if duration_ms >= float(PROFILE_SLOW_MS):
+                fields["hot_stacks"] = sampler.hot_stacks()
+
+        log_event(
+            "request",
+            method=request.method,
+            route=route,
+            blueprint=request.blueprint,
+            status=response.status_code,
+            duration_ms=round(duration_ms, 1),
+            firestore_reads=ops.reads,
+            firestore_writes=ops.writes,
+            firestore_rpcs=ops.rpcs,
+            **fields
+        )
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(exc):
+        sampler = g.pop("metrics_sampler", None)
+        if sampler is not None:
+            sampler.stop()
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            _request_ops.reset(token)
@@ -0,0 +1,19 @@
+import base64
+import binascii
+import json
+
+def encode_page_token(position):
+    """Encode a cursor position (a small dict) as an opaque, URL-safe page token."""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_page_token(token):
+    """Decode a page token produced by `encode_page_token`, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        position = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid page token.")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid page token.")
+    return position
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+CSV_MIMETYPES = ("text/csv",)
+
+def read_rows(req):
+    """Return an iterator of `(row_number, row, error)` over a JSON array, NDJSON or CSV request body.
+
+    NDJSON and CSV bodies are read from the request stream line by line. `row` is a dict, or None
+    with an `error` message when the line could not be parsed. Raises ValueError if a JSON body is
+    not an array.
+    """
+    if req.mimetype in NDJSON_MIMETYPES:
+        return read_ndjson_rows(io.TextIOWrapper(req.stream, encoding="utf-8-sig"))
+    if req.mimetype in CSV_MIMETYPES:
+        return read_csv_rows(io.TextIOWrapper(req.stream, encoding="utf-8-sig", newline=""))
+
+    data = req.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array, NDJSON or CSV body.")
+    return (
+        (row_number, row, None) if isinstance(row, dict) else (row_number, None, "Row must be an object.")
+        for row_number, row in enumerate(data, 1)
+    )
+
+def read_ndjson_rows(lines):
+    """Yield one row per non-blank JSON line."""
+    for row_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None, "Invalid JSON."
+            continue
+        if isinstance(row, dict):
+            yield row_number, row, None
+        else:
+            yield row_number, None, "Row must be an object."
+
+def read_csv_rows(lines):
+    """Yield one row per CSV record, using the header line for field names."""
+    for row_number, row in enumerate(csv.DictReader(lines), 1):
+        yield row_number, {field: value for field, value in row.items() if field and value is not None}, None
+
+# Columns written by the transaction exports, in order
+EXPORT_FIELDS = ["id", "seq", "time", "payer", "message", "amount", "category"]
+
+def ndjson_line(row):
+    """Format a row as one NDJSON line."""
+    return json.dumps(row, default=str) + "\n"
+
+def csv_line(row, fields=EXPORT_FIELDS):
+    """Format a row as one CSV record with the given columns."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([row.get(field, "") for field in fields])
+    return buffer.getvalue()
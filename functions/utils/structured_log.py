@@ -0,0 +1,6 @@
+import json
+import sys
+
+def log_event(event, severity="INFO", **fields):
+    """Write one JSON log line, which Cloud Logging ingests as a structured entry."""
+    print(json.dumps({"severity": severity, "event": event, **fields}, default=str), file=sys.stdout, flush=True)
@@ -0,0 +1,25 @@
+import math
+
+def finite_number(value):
+    """Convert a number, or a numeric string such as a CSV cell, to a finite float.
+
+    Raises ValueError for booleans, NaN and infinities, which `float` alone would accept, and
+    TypeError for values that are not numbers at all.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Expected a number, not a boolean.")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError("Expected a finite number.")
+    return number
+
+def whole_number(value):
+    """Convert a number or numeric string with no fractional part to an int.
+
+    Raises ValueError for fractions such as 3.7, which `int` would truncate, and for anything
+    `finite_number` rejects.
+    """
+    number = finite_number(value)
+    if not number.is_integer():
+        raise ValueError("Expected a whole number.")
+    return int(number)
@@ -0,0 +1,33 @@
+from flask import request
+
+class VersionConflict(Exception):
+    """Raised inside a write when the document's version no longer matches the client's If-Match."""
+
+    def __init__(self, current_version):
+        super().__init__(f"The document was modified (current version {current_version}); reload it and retry.")
+        self.current_version = current_version
+
+def expected_version():
+    """Return the document version required by the request's If-Match header.
+
+    The header holds the `version` the client last read, optionally quoted, or the ETag of a GET
+    that returned the document, whose part before the '.' is the version. Returns None when the
+    header is absent or '*'. Raises ValueError if it holds no version number.
+    """
+    value = request.headers.get("If-Match")
+    if value is None or value.strip() == "*":
+        return None
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"').split(".", 1)[0])
+    except ValueError:
+        raise ValueError("If-Match must be the document's version number or the ETag it was read with.")
+
+def check_version(data, expected):
+    """Raise VersionConflict unless the stored document has the expected version (None matches any)."""
+    current = data.get("version", 0)
+    if expected is not None and current != expected:
+        raise VersionConflict(current)
+    return current
@@ -10,7 +10,7 @@ const Statistics = ({
   surplus,
   activeHouseSize,
   insurance,
-  transactions,
+  categoryTotals,
   weeklyBalance
 }) => {
   const { theme } = useTheme(); // Access the current theme
@@ -22,14 +22,6 @@ const Statistics = ({
     borderColor: theme === "light" ? "#e4e7eb" : "#444444",
   };
 
-  const calculateCategoryBreakdown = () => {
-    const breakdown = {};
-    transactions.forEach((txn) => {
-      breakdown[txn.category] = (breakdown[txn.category] || 0) + txn.amount;
-    });
-    return breakdown;
-  };
-
   const calculateWeeklyBalances = () => {
     const weeklyBalances = {
       "balances": [],
@@ -88,7 +80,7 @@ const Statistics = ({
 
       {/* Pie Chart Section */}
       <Pane flex="2" height={400} style={{ backgroundColor: dynamicStyles.backgroundColor }}>
-        <PieChart data={calculateCategoryBreakdown()} />
+        <PieChart data={categoryTotals || {}} />
       </Pane>
     </Pane>
   );
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import {
   Pane,
   Heading,
@@ -15,6 +15,9 @@ import ManageCategoriesDialog from "../components/ManageCategoriesDialog";
 
 const API_BASE_URL = "https://api-pihdtekhfq-uc.a.run.app";
 
+// Change feed events that need a full reload are coalesced over this delay
+const RELOAD_DELAY_MS = 500;
+
 const HomePage = () => {
   const { theme } = useTheme(); // Access the current theme
 
@@ -39,10 +42,15 @@ const HomePage = () => {
   const [categories, setCategories] = useState(["Dues", "Event", "Uncategorized"]);
   const [searchQuery, setSearchQuery] = useState("");
   const [transactions, setTransactions] = useState([]);
+  const [weeklyBalance, setWeeklyBalance] = useState([]);
+  const [summary, setSummary] = useState({});
+  const transactionsLoad = useRef(0);
 
   const fetchSemesters = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/semesters`);
+      const response = await fetch(
+        `${API_BASE_URL}/semesters?fields=name,date,starting_capital,current_capital,active_house_size,insurance_cost,version`
+      );
       const data = await response.json();
       setSemesters(data);
 
@@ -55,6 +63,8 @@ const HomePage = () => {
           }, {})
         );
         fetchTransactions(data[0].id);
+        fetchWeeklyBalance(data[0].id);
+        fetchSummary(data[0].id);
       }
     } catch (error) {
       console.error("Error fetching semesters:", error);
@@ -62,20 +72,48 @@ const HomePage = () => {
   };
 
   const fetchTransactions = async (semesterId) => {
-    let next_id = "";
-    while (next_id != null) {
+    // Only the latest load replaces the list, so overlapping reloads cannot duplicate rows
+    const load = ++transactionsLoad.current;
+    const loaded = [];
+    let next_token = "";
+    while (next_token != null) {
       try {
-        const response = await fetch(`${API_BASE_URL}/transactions/?semester_id=${semesterId}&start_after=${next_id}`);
+        const response = await fetch(`${API_BASE_URL}/transactions/?semester_id=${semesterId}&page_token=${next_token}`);
         const data = await response.json();
-        next_id = data.next_start_after;
-        setTransactions((prevTransactions) => [...prevTransactions, ...data.transactions || []]);
+        next_token = data.next_page_token;
+        loaded.push(...(data.transactions || []));
       } catch (error) {
         console.error("Error fetching transactions:", error);
-        next_id == null;
+        next_token = null;
       }
+      if (load !== transactionsLoad.current) return;
     };
+    setTransactions(loaded);
   }
 
+  const fetchWeeklyBalance = async (semesterId) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/semesters/${semesterId}/weekly_balance`);
+      const data = await response.json();
+      setWeeklyBalance(data.weekly_balance || []);
+    } catch (error) {
+      console.error("Error fetching weekly balance:", error);
+      setWeeklyBalance([]);
+    }
+  };
+
+  // The statistics panel reads its totals from the semester's precomputed summary document
+  const fetchSummary = async (semesterId) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/semesters/${semesterId}/summary`);
+      const data = await response.json();
+      setSummary(response.ok ? data : {});
+    } catch (error) {
+      console.error("Error fetching summary:", error);
+      setSummary({});
+    }
+  };
+
   const fetchCategories = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/categories`);
@@ -91,9 +129,91 @@ const HomePage = () => {
     fetchCategories();
   }, []);
 
+  // Follow the selected semester's change feed and apply each change instead of refetching
+  useEffect(() => {
+    if (!selectedSemester) return;
+    let source = null;
+    let closed = false;
+    let reloadTimer = null;
+    let summaryTimer = null;
+
+    const scheduleReload = () => {
+      clearTimeout(reloadTimer);
+      reloadTimer = setTimeout(() => fetchTransactions(selectedSemester), RELOAD_DELAY_MS);
+    };
+
+    const scheduleSummary = () => {
+      clearTimeout(summaryTimer);
+      summaryTimer = setTimeout(() => fetchSummary(selectedSemester), RELOAD_DELAY_MS);
+    };
+
+    const applyChange = (change) => {
+      if (change.entity !== "semester" || change.op === "imported") scheduleSummary();
+      if (change.current_capital !== undefined) {
+        setSemesterData((prevData) => ({
+          ...prevData,
+          [change.semester_id]: { ...prevData[change.semester_id], current_capital: change.current_capital },
+        }));
+      }
+      if (change.entity === "transaction") {
+        setTransactions((prevTransactions) => {
+          const changed = { id: change.id, ...change.data };
+          if (change.op === "deleted") {
+            return prevTransactions.filter((transaction) => transaction.id !== change.id);
+          }
+          if (prevTransactions.some((transaction) => transaction.id === change.id)) {
+            return prevTransactions.map((transaction) => (transaction.id === change.id ? changed : transaction));
+          }
+          return [...prevTransactions, changed];
+        });
+      } else if (change.entity === "semester" && change.op === "updated") {
+        setSemesterData((prevData) => ({
+          ...prevData,
+          [change.id]: { ...prevData[change.id], ...change.data },
+        }));
+      } else if (change.op === "imported" || change.entity === "category") {
+        // Bulk imports and category reassignments are reloaded rather than sent row by row; an
+        // import sends one event per chunk, so the reloads are coalesced
+        scheduleReload();
+        if (change.entity === "category") fetchCategories();
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/changes/?semester_id=${selectedSemester}`);
+        const { cursor } = await response.json();
+        if (closed) return;
+        source = new EventSource(`${API_BASE_URL}/changes/?semester_id=${selectedSemester}&since=${cursor}`);
+        source.addEventListener("change", (event) => applyChange(JSON.parse(event.data)));
+        source.onerror = () => {
+          // EventSource reconnects by itself unless the server refused the cursor; then reload and start over
+          if (source.readyState === EventSource.CLOSED && !closed) {
+            source.close();
+            scheduleReload();
+            scheduleSummary();
+            connect();
+          }
+        };
+      } catch (error) {
+        console.error("Error following changes:", error);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(reloadTimer);
+      clearTimeout(summaryTimer);
+      if (source) source.close();
+    };
+  }, [selectedSemester]);
+
   const handleSelectSemester = (semesterId) => {
     setSelectedSemester(semesterId);
     fetchTransactions(semesterId);
+    fetchWeeklyBalance(semesterId);
+    fetchSummary(semesterId);
   };
 
   const handleCreateNewSemester = async () => {
@@ -122,6 +242,8 @@ const HomePage = () => {
         setSemesterData((prevData) => ({ ...prevData, [data.id]: data }));
         setSelectedSemester(data.id);
         fetchTransactions(data.id);
+        fetchWeeklyBalance(data.id);
+        fetchSummary(data.id);
         setNewSemesterName("");
         setIsNewSemesterDialogShown(false);
       } else {
@@ -132,44 +254,50 @@ const HomePage = () => {
     }
   };
 
+  const fetchSemester = async (semesterId) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/semesters/${semesterId}`);
+      const data = await response.json();
+      setSemesterData((prevData) => ({ ...prevData, [semesterId]: data }));
+    } catch (error) {
+      console.error("Error fetching semester:", error);
+    }
+  };
+
   const handleSaveSemesterSummary = async (updatedValues) => {
     if (!selectedSemester) return;
-  
-    // Calculate the new current capital if the starting capital is modified
-    let updatedCurrentCapital = semesterData[selectedSemester].current_capital;
-  
-    if (updatedValues.startingCapital !== undefined) {
-      const totalTransactionAmount = transactions.reduce((sum, txn) => sum + txn.amount, 0);
-      updatedCurrentCapital = updatedValues.startingCapital + totalTransactionAmount;
-    }
-  
-    // Ensure the payload matches the expected structure
+
+    // The server adjusts current capital when the starting capital changes
     const payload = {
       active_house_size: updatedValues.activeHouseSize,
       starting_capital: updatedValues.startingCapital,
       insurance_cost: updatedValues.insurance,
-      current_capital: updatedCurrentCapital, // Include updated current capital
     };
-  
+
     try {
       const response = await fetch(`${API_BASE_URL}/semesters/${selectedSemester}`, {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
+          "If-Match": `"${semesterData[selectedSemester].version || 0}"`,
         },
         body: JSON.stringify(payload),
       });
-  
+
       if (response.ok) {
+        const { data } = await response.json();
         setSemesterData((prevData) => ({
           ...prevData,
           [selectedSemester]: {
             ...prevData[selectedSemester],
-            ...updatedValues,
-            current_capital: updatedCurrentCapital, // Update local state
+            ...data,
           },
         }));
         console.log("Semester updated successfully");
+      } else if (response.status === 409) {
+        // Someone else changed the semester; show their version before editing again
+        console.error("Semester was changed elsewhere; reloading it");
+        fetchSemester(selectedSemester);
       } else {
         console.error("Failed to update semester");
       }
@@ -177,16 +305,22 @@ const HomePage = () => {
       console.error("Error updating semester:", error);
     }
   };
-  
 
   const handleDeleteSemester = async () => {
     if (!selectedSemester) return;
 
     try {
-      const response = await fetch(`${API_BASE_URL}/semesters/${selectedSemester}`, {
+      let response = await fetch(`${API_BASE_URL}/semesters/${selectedSemester}`, {
         method: "DELETE",
       });
 
+      // Large semesters are deleted in chunks; repeat the request until it finishes
+      while (response.status === 202) {
+        response = await fetch(`${API_BASE_URL}/semesters/${selectedSemester}`, {
+          method: "DELETE",
+        });
+      }
+
       if (response.ok) {
         const updatedSemesters = semesters.filter(
           (semester) => semester.id !== selectedSemester
@@ -358,9 +492,9 @@ const HomePage = () => {
               semesterData[selectedSemester].active_house_size || 0
             }
             insurance={semesterData[selectedSemester].insurance_cost || 0}
-            transactions={transactions || []}
+            categoryTotals={summary.by_category}
             categories={categories}
-            weeklyBalance={semesterData[selectedSemester].weekly_balance || []}
+            weeklyBalance={weeklyBalance}
           />
 
           <Pane marginTop={16}>
@@ -17,17 +17,26 @@ const Reimbursements = () => {
   };
 
   const [reimbursements, setReimbursements] = useState([]);
+  const [nextPageToken, setNextPageToken] = useState(null);
+  const [isLoading, setIsLoading] = useState(false);
 
-  const fetchReimbursements = async () => {
+  // Load one page at a time; "Load more" fetches the next page with its token
+  const fetchReimbursements = async (pageToken = "") => {
+    setIsLoading(true);
     try {
-      const response = await fetch(`${API_BASE_URL}/reimbursements`);
+      const response = await fetch(`${API_BASE_URL}/reimbursements?page_token=${pageToken}`);
       if (!response.ok) {
         throw new Error(`HTTP error! Status: ${response.status}`);
       }
       const data = await response.json();
-      setReimbursements(data);
+      setReimbursements((prevReimbursements) =>
+        pageToken ? [...prevReimbursements, ...data.reimbursements] : data.reimbursements
+      );
+      setNextPageToken(data.next_page_token);
     } catch (error) {
       console.error("Error fetching reimbursements:", error);
+    } finally {
+      setIsLoading(false);
     }
   };
 
@@ -144,6 +153,19 @@ const Reimbursements = () => {
           ))}
         </Table.Body>
       </Table>
+      {nextPageToken && (
+        <Button
+          marginTop={16}
+          isLoading={isLoading}
+          onClick={() => fetchReimbursements(nextPageToken)}
+          style={{
+            backgroundColor: dynamicStyles.buttonBackgroundColor,
+            color: dynamicStyles.buttonTextColor,
+          }}
+        >
+          Load more
+        </Button>
+      )}
     </Pane>
   );
 };